@@ -1,39 +1,138 @@
 import asyncpg
 import aiohttp
-from datetime import date, datetime, timedelta
-from quart import Quart, Response, render_template, request, Response, abort, redirect, jsonify, send_file, send_from_directory
-from utils.time import Time
+from datetime import date, datetime
+from quart import Quart, Response, g, render_template, render_template_string, request, Response, abort, redirect, jsonify, send_file, send_from_directory
+from utils.assets import AssetCache
+from utils.bodies import read_csv, read_float64, read_json
+from utils.bulk import RowError, exam_row, patient_row
+from utils.compression import ResponseCompressor
+from utils.time import DateParser
 from utils.tokens import TokenUtils
+from utils.dataset import Dataset
+from utils.gestation import format_date, gestation, gestation_many
+from utils.json_provider import JSONProvider
 from utils.lastfm import LastFMClient
+from utils.media import MediaCache
+from utils.metrics import OutgoingRequests, RequestMetrics
+from utils.offload import BudgetExceeded, Saturated, StatsPool, WorkerLost
+from utils.patient_cache import PatientCache
+from utils.queries import queries
+from utils.stats import ArrayData, GroupedData, describe
 from models import Examination, Patient
+from array import array
+import asyncio
 import config
 import functools
-import io
-import json
-import random
+import hashlib
 import statistics
+import time
+from urllib.parse import urlencode
 
 app = Quart(__name__)
-token_handler = TokenUtils(app)
+app.json = JSONProvider(app)
+numpy_threshold = getattr(config, 'numpy_threshold', 10000)
+media_chunk_size = getattr(config, 'media_chunk_size', 64 * 1024)
+# per connect and per read rather than in total, so a long video can still stream
+media_timeout = aiohttp.ClientTimeout(sock_connect=getattr(config, 'media_timeout', 10),
+                                      sock_read=getattr(config, 'media_timeout', 10))
+patients_page_size = getattr(config, 'patients_page_size', 500)
+gestation_batch_limit = getattr(config, 'gestation_batch_limit', 10000)
+bulk_limit = getattr(config, 'bulk_limit', 10000)
+stats_offload_threshold = getattr(config, 'stats_offload_threshold', 100000)
+stream_body_size = getattr(config, 'stream_body_size', 1024 * 1024)
+date_parser = DateParser(getattr(config, 'date_parse_cache_size', 1024))
+token_handler = TokenUtils(app, cache_size=getattr(config, 'token_cache_size', 1024),
+                           cache_ttl=getattr(config, 'token_cache_ttl', 300))
+metrics = RequestMetrics()
+outgoing = OutgoingRequests()
+compressor = ResponseCompressor(getattr(config, 'compress_min_size', 1024),
+                                getattr(config, 'compress_thread_threshold', 256 * 1024),
+                                getattr(config, 'compress_workers', 2))
+assets = AssetCache(getattr(config, 'static_max_age', 86400))
+assets.add('keys', 'static/txt/ssh_keys.txt', 'text/plain')
+assets.add_directory('pgp', 'static/txt/pgp')
+assets.add('keybase.txt', 'templates/keybase.txt', 'text/plain', render=render_template_string)
+assets.add('tokens.html', 'templates/tokens.html', 'text/html', render=render_template_string)
+assets.add('terms.html', 'templates/terms.html', 'text/html', render=render_template_string)
 
 
 @app.before_serving
 async def setup_pool():
-    app.pool = await asyncpg.create_pool(config.postgresql)
-    app.session = aiohttp.ClientSession()
-    app.lastfm_client = LastFMClient(app.session)
+    queries.warm = getattr(config, 'statement_cache_size', 100) > 0
+    app.pool = await asyncpg.create_pool(
+        config.postgresql,
+        min_size=getattr(config, 'pool_min_size', 10),
+        max_size=getattr(config, 'pool_max_size', 10),
+        statement_cache_size=getattr(config, 'statement_cache_size', 100),
+        max_inactive_connection_lifetime=getattr(config, 'pool_max_inactive_lifetime', 300.0),
+        init=queries.setup_connection,
+    )
+    app.session = aiohttp.ClientSession(trace_configs=[outgoing.trace_config])
+    app.drug_or_tolkien = Dataset.load('static/json/antidepressant_or_tolkien.json', app.json.dumps, 'type')
+    app.lastfm_client = LastFMClient(app.session, max_age=getattr(config, 'fm_max_age', 60))
+    if getattr(config, 'fm_background_refresh', False):
+        app.lastfm_client.start()
+    app.media_cache = None
+    if (directory := getattr(config, 'media_cache_dir', None)) is not None:
+        app.media_cache = MediaCache(app.session, directory, getattr(config, 'media_cache_size', 512 * 1024 * 1024),
+                                     media_chunk_size)
+        await app.media_cache.load()
+        if prefetch := getattr(config, 'media_prefetch', 0):
+            app.add_background_task(app.media_cache.fill_pool, 'cat', pick_cat, prefetch)
+            app.add_background_task(app.media_cache.fill_pool, 'dog', pick_dog, prefetch)
+    app.patient_cache = None
+    if max_size := getattr(config, 'patient_cache_size', 64 * 1024 * 1024):
+        app.patient_cache = PatientCache(config.postgresql, max_size)
+        app.patient_cache.start()
+    app.stats_pool = None
+    if workers := getattr(config, 'stats_workers', 2):
+        app.stats_pool = StatsPool(workers, getattr(config, 'stats_queue_depth', 4),
+                                   getattr(config, 'stats_cpu_budget', 5.0))
+    await assets.refresh()
+    if reload_interval := getattr(config, 'static_reload_interval', 5):
+        assets.start(reload_interval)
 
 @app.after_serving
 async def close_pool():
+    app.lastfm_client.close()
+    assets.close()
+    compressor.close()
+    if app.patient_cache is not None:
+        app.patient_cache.close()
+    if app.stats_pool is not None:
+        app.stats_pool.close()
+    if app.media_cache is not None:
+        app.media_cache.close()
     await app.pool.close()
     await app.session.close()
 
 
+@app.before_request
+async def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.after_request
+async def record_metrics(resp):
+    # registered first so it runs last, after compression
+    if (started := g.get('started')) is not None:
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        metrics.record(request.method, route, resp.status_code, time.perf_counter() - started)
+    return resp
+
+
 @app.after_request
 async def add_header(resp):
     resp.headers['Access-Control-Allow-Origin'] = '*'
     return resp
 
+
+@app.after_request
+async def compress_response(resp):
+    if request.method == 'HEAD' or request.path in ('/cat', '/dog'):
+        return resp
+    return await compressor.compress(resp, request.accept_encodings)
+
 def requires_auth(view):
     @functools.wraps(view)
     async def wrapper(*args, **kwargs):
@@ -63,17 +162,85 @@ async def jam_sessions():
 @app.route('/.well-known/keybase.txt')
 @app.route('/keybase.txt')
 async def keybase_validation():
-    return await render_template('keybase.txt')
+    return send_asset('keybase.txt') or await render_template('keybase.txt')
 
 
 @app.route('/tokens')
 async def token_page():
-    return await render_template('tokens.html')
+    return send_asset('tokens.html') or await render_template('tokens.html')
+
+
+@app.route('/tokens/cache')
+async def token_cache_stats():
+    """GET hit/miss counters for the verified-token cache."""
+    if request.headers.get('Authorization') != config.api_key:
+        if request.args.get('key') != config.api_key:
+            return '<samp>Not authorised</samp>', 401
+    return token_handler.cache.stats
+
+
+@app.route('/queries')
+async def query_stats():
+    """GET call counts and latency for every registered SQL statement."""
+    if request.headers.get('Authorization') != config.api_key:
+        if request.args.get('key') != config.api_key:
+            return '<samp>Not authorised</samp>', 401
+    return queries.summary()
+
+
+@app.route('/metrics')
+async def prometheus_metrics():
+    """GET request, pool, cache and query metrics in Prometheus text format."""
+    if request.headers.get('Authorization') != config.api_key:
+        if request.args.get('key') != config.api_key:
+            return '<samp>Not authorised</samp>', 401
+    pool = app.pool
+    gauges = [
+        ('pool_connections', 'Connections open in the asyncpg pool.', [({}, pool.get_size())]),
+        ('pool_idle_connections', 'Open connections not checked out of the pool.', [({}, pool.get_idle_size())]),
+        ('pool_max_connections', 'asyncpg pool size limit.', [({}, pool.get_max_size())]),
+        ('http_requests_in_flight', 'Outgoing aiohttp requests waiting for a response.', [({}, outgoing.in_flight)]),
+        ('http_connection_limit', 'aiohttp connector limit (0 means unlimited).', [({}, app.session.connector.limit)]),
+        ('token_cache_entries', 'Verified tokens cached.', [({}, token_handler.cache.stats['size'])]),
+        ('lastfm_failures', 'Consecutive failed Last.fm refreshes.', [({}, app.lastfm_client.failures)]),
+    ]
+    cache = token_handler.cache.stats
+    counters = [
+        ('query_calls_total', 'Calls per registered SQL statement.',
+         [({'query': name}, calls) for name, (calls, _, _) in queries.stats.items()]),
+        ('query_seconds_total', 'Time spent per registered SQL statement.',
+         [({'query': name}, total) for name, (_, total, _) in queries.stats.items()]),
+        ('token_cache_lookups_total', 'Verified-token cache lookups.',
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('http_requests_total', 'Outgoing aiohttp requests, by whether a response arrived.',
+         [({'result': 'ok'}, outgoing.ok), ({'result': 'error'}, outgoing.failed)]),
+    ]
+    if app.stats_pool is not None:
+        gauges.append(('stats_jobs_in_flight', 'Large statistics jobs running or queued in worker processes.',
+                       [({}, app.stats_pool.pending)]))
+        counters.append(('stats_pool_restarts_total', 'Times the stats process pool was replaced after a worker died.',
+                         [({}, app.stats_pool.restarts)]))
+    if app.patient_cache is not None:
+        patients = app.patient_cache.stats
+        gauges.append(('patient_cache_bytes', 'Size of the cached /patients/<id> payloads.', [({}, patients['size'])]))
+        gauges.append(('patient_cache_listening', '1 while the patient cache is receiving invalidations.',
+                       [({}, int(patients['listening']))]))
+        counters.append(('patient_cache_lookups_total', '/patients/<id> cache lookups.',
+                         [({'result': 'hit'}, patients['hits']), ({'result': 'miss'}, patients['misses'])]))
+    if app.media_cache is not None:
+        media = app.media_cache.stats
+        gauges.append(('media_cache_bytes', 'Size of the on-disk cat/dog cache.', [({}, media['size'])]))
+        gauges.append(('media_pool_items', 'Prefetched cat/dog items ready to serve.',
+                       [({'kind': kind}, size) for kind, size in media['pools'].items()]))
+        counters.append(('media_cache_lookups_total', 'Cat/dog media cache lookups.',
+                         [({'result': 'hit'}, media['hits']), ({'result': 'miss'}, media['misses'])]))
+    body = metrics.render(gauges, counters)
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.route('/terms')
 async def terms_of_service():
-    return await render_template('terms.html')
+    return send_asset('terms.html') or await render_template('terms.html')
 
 
 @app.route('/gestation')
@@ -85,85 +252,304 @@ async def get_gestation_age():
     if (dt := request.args.get('lmp')) is None:
         abort(400)
     try:
-        dt = Time(dt)
+        lmp, past = date_parser.parse(dt)
     except ValueError:
         return '<samp>bad request</samp>', 400
-    if dt._past is False:
-        # pdt converts all dates to future when year isn't specified. We assume this was the case when the year is up
-        # by one
-        if dt.dt.date().year - date.today().year == 1:
-            dt.dt = dt.dt.replace(year=date.today().year)
-        else:
-            return {'message': 'This date is in the future.', 'parsed_date': dt.dt.strftime('%d %b %Y')}, 400
+    if not past:
+        return {'message': 'This date is in the future.', 'parsed_date': format_date(lmp)}, 400
+    return gestation(lmp, date.today())
 
-    # This is not Naegle's but is in keeping with 40 weeks of gestation.
-    edd = (dt.dt.date() + timedelta(days=7 * 41)).strftime('%d %b %Y')
 
-    # Probably missed something here
-    gest_age = divmod((date.today() - dt.dt.date()).days, 7)
-    return {'lmp': dt.dt.date().strftime('%d %b %Y'), 'edd': edd, 'gestation_age': gest_age[0] + gest_age[1] * 0.1}
+@app.route('/gestation/batch', methods=['POST'])
+@requires_auth
+async def get_gestation_ages():
+    """POST an array of LMP date strings. Returns an array with the /gestation result for each one, in the same order.
+
+    Items that can't be parsed or are in the future get a ``message`` instead, like the single-date endpoint.
+    """
+    try:
+        data = app.json.loads(await request.get_data())
+    except Exception as e:
+        return send_error_message(e)
+    if type(data) != list:
+        return send_error_message('Data must be an array.')
+    if len(data) > gestation_batch_limit:
+        return send_error_message(f'At most {gestation_batch_limit} dates per request.')
+
+    today = date.today()
+    results = [None] * len(data)
+    valid, lmps = [], []
+    for index, item in enumerate(data):
+        if type(item) != str:
+            results[index] = {'input': item, 'message': 'Expected a date string.'}
+            continue
+        try:
+            lmp, past = date_parser.parse(item, today)
+        except ValueError:
+            results[index] = {'input': item, 'message': 'bad request'}
+            continue
+        if not past:
+            results[index] = {'input': item, 'message': 'This date is in the future.', 'parsed_date': format_date(lmp)}
+            continue
+        valid.append(index)
+        lmps.append(lmp)
+    for index, result in zip(valid, gestation_many(lmps, today)):
+        result['input'] = data[index]
+        results[index] = result
+    return jsonify(results)
+
+
+def history_options():
+    """``Patient.fetch`` keyword arguments from ``?limit=&before=<date>,<exam_id>&since=<exam_id>&view=summary``.
+
+    Raises ``ValueError`` for anything malformed.
+    """
+    def exam_id(value):
+        value = int(value)
+        # examinations.id is a SERIAL; anything else would only fail in asyncpg
+        if not -2 ** 31 <= value < 2 ** 31:
+            raise ValueError(f'examination id out of range: {value}')
+        return value
+
+    options = {}
+    if (limit := request.args.get('limit')) is not None:
+        options['limit'] = max(1, min(int(limit), patients_page_size))
+    if (before := request.args.get('before')) is not None:
+        day, last = before.split(',')
+        # an empty date is an undated examination
+        options['before'] = (date.fromisoformat(day) if day else None, exam_id(last))
+    if (since := request.args.get('since')) is not None:
+        options['since'] = exam_id(since)
+    if (view := request.args.get('view')) is not None:
+        if view != 'summary':
+            raise ValueError(f'unknown view {view!r}')
+        options['details'] = False
+    return options
 
 
 @app.route('/patients/<int:id>', methods=['GET', 'POST'])
 async def get_patient_data(id):
-    """GET a patient's details.
-    
-    POST examination details to append to their history.
+    """GET a patient's details, with an ETag. The full record is served from ``app.patient_cache`` when possible.
+
+    The history (newest first) can be cut down with ``?limit=<n>``, which adds a ``Link`` header pointing at the next
+    page, ``?before=<YYYY-MM-DD>,<exam_id>`` for examinations older than that one (the date is left empty for an
+    undated one), ``?since=<exam_id>`` for examinations added after that one, and ``?view=summary`` to leave out
+    ``details``.
+
+    POST examination details to append to their history. Returns the new examination.
     """
     if request.headers.get('Authorization') != config.api_key:
         if request.args.get('key') != config.api_key:
             return '<samp>Not Authorised</samp>', 401
-    payload = {}
-    data = await request.json
-    record = await app.pool.fetchrow('SELECT * FROM patients WHERE id = $1;', id)
-    patient = Patient.build_from_record(record)
-    async with app.pool.acquire() as con:
-        if request.method == 'GET':
-            history = await patient.fetch_history(con=con)
+    if request.method == 'POST':
+        data = await request.json
+        dt = data.get('date')
+        if dt is not None:
+            _date = datetime.strptime(dt, '%d %b %Y').date()
         else:
-            dt = data.get('date')
-            if dt is not None:
-                _date = datetime.strptime(dt, '%d %b %Y').date()
-            else:
-                _date = None
-            history = await patient.add_exam(data['summary'], data['details'], _date, con=con)
-        nok = await patient.get_next_of_kin(con=con)
-    payload.update(**patient.__dict__)
+            _date = None
+        async with app.pool.acquire() as con:
+            record = await queries.fetchrow(con, 'patients.get', id)
+            if record is None:
+                return '<samp>No such patient</samp>', 404
+            exam = await Patient.build_from_record(record).add_exam(data['summary'], data['details'], _date, con=con)
+        # the NOTIFY will reach this worker too, but not necessarily before its next request
+        if app.patient_cache is not None:
+            app.patient_cache.invalidate(id)
+        return exam.__dict__, 201
+
+    try:
+        options = history_options()
+    except ValueError:
+        return '<samp>bad request</samp>', 400
+    # only the full record is cached
+    cache = app.patient_cache if not options else None
+    if cache is not None and (entry := cache.get(id)) is not None:
+        return json_bytes(*entry)
+    version = cache.version if cache is not None else None
+    async with app.pool.acquire() as con:
+        patient = await Patient.fetch(id, con=con, **options)
+    if patient is None:
+        return '<samp>No such patient</samp>', 404
+    nok = patient.next_of_kin
+    payload = dict(**patient.__dict__)
     payload['history'] = [h.__dict__ for h in patient.history]
-    payload['next_of_kin'] = nok.__dict__
+    payload['next_of_kin'] = nok.__dict__ if nok is not None else None
+    if options.get('details') is False:
+        payload['history'] = [{k: v for k, v in h.items() if k != 'details'} for h in payload['history']]
 
-    return payload
+    body = app.json.dumps(payload).encode()
+    if cache is None:
+        response = json_bytes(body, hashlib.sha1(body).hexdigest())
+    else:
+        response = json_bytes(*cache.put(id, body, version))
+    if (limit := options.get('limit')) is not None and len(patient.history) == limit:
+        last = patient.history[-1]
+        args = request.args.to_dict()
+        args.pop('key', None)
+        args['before'] = f'{last.date.isoformat() if last.date is not None else ""},{last.id}'
+        response.headers['Link'] = f'</patients/{id}?{urlencode(args)}>; rel="next"'
+    return response
+
+
+async def stream_patients(after, ndjson):
+    """Yield patients a page at a time from a server-side cursor, so memory doesn't grow with the table."""
+    separator = b'\n' if ndjson else b','
+    if not ndjson:
+        yield b'['
+    first = True
+    async with app.pool.acquire() as con:
+        async with con.transaction():
+            async for records in queries.pages(con, 'patients.all', after, size=patients_page_size):
+                chunk = separator.join(app.json.dumps(dict(record)).encode() for record in records)
+                if ndjson:
+                    chunk += separator
+                elif not first:
+                    chunk = separator + chunk
+                first = False
+                yield chunk
+    if not ndjson:
+        yield b']'
 
 
 @app.route('/patients', methods=['POST', 'GET'])
 async def post_patient_stats():
     """GET basic details of all patients
-    
+
+    ``?after=<id>&limit=<n>`` returns one page, with a ``Link`` header pointing at the next one. Without ``limit``
+    every patient is streamed from a server-side cursor, as a JSON array or, with ``?format=ndjson``, one object per
+    line.
+
     POST details of a new patient. Redirects to the new patient's page.
     """
     if request.headers.get('Authorization') != config.api_key:
         if request.args.get('key') != config.api_key:
             return '<samp>Not authorised</samp>', 401
     if request.method == 'GET':
-        data = []
-        query = 'SELECT * FROM patients ORDER BY id;'
-        patients = await app.pool.fetch(query)
-        for record in patients:
-            patient = Patient.build_from_record(record)
-            data.append(dict(name=patient.name, age=patient.age, sex=patient.sex, occupation=patient.occupation))
-        return jsonify(data)
+        after = request.args.get('after', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, patients_page_size))
+            records = await queries.fetch(app.pool, 'patients.page', after, limit)
+            response = jsonify([dict(record) for record in records])
+            if len(records) == limit:
+                response.headers['Link'] = f'</patients?after={records[-1]["id"]}&limit={limit}>; rel="next"'
+            return response
+        ndjson = request.args.get('format') == 'ndjson'
+        mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+        return Response(stream_patients(after, ndjson), mimetype=mimetype)
     data = await request.json
     nok = data['next_of_kin']
     nok = (nok['name'], nok['age'], nok['sex'], nok['occupation'])
-    query = 'INSERT INTO relations (name, age, sex, occupation) VALUES ($1, $2, $3, $4) RETURNING *;'
-    next_of_kin = await app.pool.fetchrow(query, *nok)
-    query = "INSERT INTO patients (name, age, sex, occupation, date_of_admission, next_of_kin_id) VALUES " \
-            "($1, $2, $3, $4, $5, $6) RETURNING *;"
-    patient = await app.pool.fetchrow(query, data['name'], data['age'], data['sex'], data['occupation'],
-                                      datetime.strptime(data['doa'], '%d %b %Y').date(), next_of_kin['id'])
+    next_of_kin = await queries.fetchrow(app.pool, 'relations.insert', *nok)
+    patient = await queries.fetchrow(app.pool, 'patients.insert', data['name'], data['age'], data['sex'],
+                                     data['occupation'], datetime.strptime(data['doa'], '%d %b %Y').date(),
+                                     next_of_kin['id'])
     return redirect('/patients/{}'.format(patient['id']))
 
 
+async def read_rows():
+    """Rows of a bulk upload. NDJSON (``application/x-ndjson``) is decoded line by line as the body arrives; anything
+    else is decoded as one JSON array. A line that isn't valid JSON comes out as the exception, so it can be reported
+    against its row.
+    """
+    if request.mimetype != 'application/x-ndjson':
+        data = app.json.loads(await request.get_data())
+        if type(data) != list:
+            raise ValueError('Data must be an array.')
+        for row in data:
+            yield row
+        return
+    buffer = bytearray()
+    async for chunk in request.body:
+        buffer += chunk
+        if (end := buffer.rfind(b'\n')) == -1:
+            continue
+        lines = bytes(buffer[:end]).split(b'\n')
+        del buffer[:end + 1]
+        for line in lines:
+            if line.strip():
+                try:
+                    yield app.json.loads(line)
+                except ValueError as e:
+                    yield e
+    if buffer.strip():
+        try:
+            yield app.json.loads(bytes(buffer))
+        except ValueError as e:
+            yield e
+
+
+async def bulk_load(validate, insert):
+    """Validate every uploaded row with ``validate``, then hand the good ones to ``insert`` (a coroutine function
+    taking the rows and returning their new ids).
+
+    Bad rows are skipped and reported by position; ``ids`` lines up with the input, with ``null`` for skipped rows.
+    """
+    rows, positions, errors = [], [], []
+    index = -1
+    try:
+        async for row in read_rows():
+            index += 1
+            if index >= bulk_limit:
+                return send_error_message(f'At most {bulk_limit} rows per request.')
+            if isinstance(row, Exception):
+                errors.append({'index': index, 'message': f'{row.__class__.__name__}: {row}'})
+                continue
+            try:
+                rows.append(validate(row))
+            except RowError as e:
+                errors.append({'index': index, 'message': str(e)})
+                continue
+            positions.append(index)
+    except Exception as e:
+        return send_error_message(e)
+    if index == -1:
+        return send_error_message('Data is empty.')
+    ids = [None] * (index + 1)
+    if rows:
+        for position, new_id in zip(positions, await insert(rows)):
+            ids[position] = new_id
+    return {'ids': ids, 'inserted': len(rows), 'errors': errors}, 200 if rows else 400
+
+
+@app.route('/patients/bulk', methods=['POST'])
+async def post_patients_bulk():
+    """POST many patients at once, as a JSON array or NDJSON, each shaped like a ``POST /patients`` body.
+
+    Loaded with COPY in one transaction. Returns the new ids and any rows that were rejected.
+    """
+    if request.headers.get('Authorization') != config.api_key:
+        if request.args.get('key') != config.api_key:
+            return '<samp>Not authorised</samp>', 401
+
+    async def insert(rows):
+        async with app.pool.acquire() as con:
+            return await Patient.insert_many(rows, con=con)
+    return await bulk_load(patient_row, insert)
+
+
+@app.route('/patients/<int:id>/exams/bulk', methods=['POST'])
+async def post_exams_bulk(id):
+    """POST many examinations for a patient, as a JSON array or NDJSON, each shaped like a ``POST /patients/<id>``
+    body.
+    """
+    if request.headers.get('Authorization') != config.api_key:
+        if request.args.get('key') != config.api_key:
+            return '<samp>Not authorised</samp>', 401
+    if not await queries.fetchval(app.pool, 'patients.exists', id):
+        return '<samp>No such patient</samp>', 404
+    today = date.today()
+
+    async def insert(rows):
+        async with app.pool.acquire() as con:
+            ids = await Examination.insert_many(id, rows, con=con)
+        if app.patient_cache is not None:
+            app.patient_cache.invalidate(id)
+        return ids
+    return await bulk_load(lambda js: exam_row(js, today), insert)
+
+
 @app.route('/patients/<int:id>/<int:exam_id>', methods=['GET', 'PATCH'])
 async def get_examination(id, exam_id):
     """GET details of a specific examination for a patient.
@@ -173,43 +559,135 @@ async def get_examination(id, exam_id):
     if request.headers.get('Authorization') != config.api_key:
         if request.args.get('key') != config.api_key:
             return '<samp>Not authorised</samp>', 401
-    exam = await app.pool.fetchrow('SELECT * FROM examinations WHERE id = $1;')
+    exam = await queries.fetchrow(app.pool, 'examinations.get', exam_id)
+    if exam is None or exam['patient_id'] != id:
+        return '<samp>No such examination</samp>', 404
     if request.method == 'GET':
         return dict(**exam)
     data = await request.json
     exam = Examination.build_from_record(exam)
     async with app.pool.acquire() as con:
-        exam = await exam.amend(con=con, **data)
+        exam = await exam.amend(con=con, summary=data.get('summary'), details=data.get('details'))
+    if app.patient_cache is not None:
+        app.patient_cache.invalidate(id)
     return exam.__dict__
 
 
+async def proxy_media(url, mimetype, *, ranges=False, cache=None):
+    """Stream an upstream file through to the client, at most ``media_chunk_size`` bytes at a time.
+
+    Returns ``None`` if upstream didn't answer with the file. When ``ranges`` is set, the client's ``Range`` header is
+    forwarded so video players can seek. Complete (non-range) downloads are also written to ``cache`` as they pass.
+    """
+    headers = {}
+    if ranges and (range_header := request.headers.get('Range')) is not None:
+        headers['Range'] = range_header
+    upstream = await app.session.get(url, headers=headers, timeout=media_timeout)
+    if upstream.status not in (200, 206):
+        upstream.release()
+        return None
+    writer = cache.writer(url) if cache is not None and upstream.status == 200 else None
+
+    async def body():
+        try:
+            async for chunk in upstream.content.iter_chunked(media_chunk_size):
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        else:
+            if writer is not None:
+                try:
+                    await writer.commit()
+                except OSError:
+                    # the client already has the file; it just won't be cached
+                    app.logger.exception('Could not cache %s', url)
+        finally:
+            upstream.release()
+
+    response = Response(body(), status=upstream.status, content_type=upstream.headers.get('Content-Type', mimetype))
+    passthrough = ('Content-Length', 'Last-Modified', 'ETag')
+    if ranges:
+        passthrough += ('Content-Range', 'Accept-Ranges')
+    for header in passthrough:
+        if header in upstream.headers:
+            response.headers[header] = upstream.headers[header]
+    return response
+
+
+async def send_media(kind, picker, mimetype, *, ranges=False):
+    """Serve a random item of ``kind``: from the prefetched pool, then the disk cache, then straight from upstream.
+
+    Returns ``None`` if upstream had nothing, and a 502 if it couldn't be reached or didn't answer in time.
+    """
+    try:
+        return await _send_media(kind, picker, mimetype, ranges=ranges)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        app.logger.warning('Fetching a %s failed: %r', kind, e)
+        return f'<samp>Could not reach the {kind} CDN</samp>', 502
+
+
+async def _send_media(kind, picker, mimetype, *, ranges=False):
+    cache = app.media_cache
+    if cache is not None and (path := cache.from_pool(kind, picker)) is not None:
+        return await send_file(path, conditional=True)
+    if (url := await picker()) is None:
+        return None
+    if cache is not None and (path := cache.get(url)) is not None:
+        return await send_file(path, conditional=True)
+    if url.endswith(('.mp4', '.webm')):
+        mimetype = 'video'
+    else:
+        ranges = False
+    return await proxy_media(url, mimetype, ranges=ranges, cache=cache)
+
+
+async def pick_cat():
+    async with app.session.get(config.cat_cdn, timeout=media_timeout) as resp:
+        if resp.status != 200:
+            return None
+        js = await resp.json()
+    return js[0]['url']
+
+
+async def pick_dog():
+    async with app.session.get(config.dog_db, timeout=media_timeout) as resp:
+        if resp.status != 200:
+            return None
+        filename = await resp.text()
+    return f'{config.dog_cdn}/{filename}'
+
+
 @app.route('/cat')
 async def random_cat():
     """GET a random cat photo. Helps take the edge off. At least for me."""
-    async with app.session.get(config.cat_cdn) as resp:
-        if resp.status != 200:
-            return '<samp>Could not find cat :(</samp>', 404
-        js = await resp.json()
-    async with app.session.get(js[0]['url']) as img:
-        to_send = io.BytesIO(await img.read())
-    return await send_file(to_send, 'image')
+    response = await send_media('cat', pick_cat, 'image')
+    if response is None:
+        return '<samp>Could not find cat :(</samp>', 404
+    return response
 
 
 @app.route('/dog')
 async def random_dog():
     """GET a random dog photo/video. This CDN is kinda wonky, you might want to redesign this when you fork."""
-    async with app.session.get(config.dog_db) as resp:
-        if resp.status != 200:
-            return '<samp>Could not find dog :(</samp>', 404
+    response = await send_media('dog', pick_dog, 'image', ranges=True)
+    if response is None:
+        return '<samp>Could not find dog :(</samp>', 404
+    return response
 
-        filename = await resp.text()
-        url = f'{config.dog_cdn}/{filename}'
-        async with app.session.get(url) as other:
-            if other.status != 200:
-                return '<samp>Could not download dog image/video :(</samp>', 404
-            fp = io.BytesIO(await other.read())
-        mimetype = 'video' if filename.endswith(('.mp4', '.webm')) else 'image'
-        return await send_file(fp, mimetype)
+
+@app.route('/media/cache')
+async def media_cache_stats():
+    """GET size and hit/miss counters for the cat/dog media cache."""
+    if request.headers.get('Authorization') != config.api_key:
+        if request.args.get('key') != config.api_key:
+            return '<samp>Not authorised</samp>', 401
+    if app.media_cache is None:
+        return {'enabled': False}
+    return app.media_cache.stats
 
 
 @app.route('/antidepressant-or-tolkien')
@@ -219,21 +697,56 @@ async def drug_or_tolkien():
            '<a href="/antidepressant-or-tolkien/all">all</a> endpoints as needed.</samp>'
 
 
+def json_bytes(body, etag=None):
+    """Response for already-encoded JSON, answering ``If-None-Match`` with a 304 when the ETag matches."""
+    # weak comparison, since the compression stage weakens ETags on compressed responses
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(b'', status=304)
+    else:
+        response = Response(body, content_type='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+def send_asset(name):
+    """Serve a preloaded file from ``assets`` in the best encoding the client accepts. ``None`` if it isn't loaded."""
+    if (asset := assets.get(name)) is None:
+        return None
+    encoding, body, etag = asset.negotiate(request.accept_encodings)
+    if request.if_none_match.contains(etag):
+        response = Response(b'', status=304)
+    else:
+        response = Response(body, content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={assets.max_age}'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
 @app.route('/antidepressant-or-tolkien/all')
 async def drug_or_tolkien_all():
-    if not hasattr(app, 'drug_or_tolkien_js'):
-        with open('static/json/antidepressant_or_tolkien.json') as f:
-            app.drug_or_tolkien_js = json.load(f)
-    random.shuffle(app.drug_or_tolkien_js)
-    return app.drug_or_tolkien_js
+    """GET every entry. Optional ``?type=drug|tolkien``, ``?limit=``, and ``?shuffle=1`` (with ``&seed=`` for a
+    repeatable order).
+    """
+    body, etag = app.drug_or_tolkien.select(
+        request.args.get('type'),
+        limit=request.args.get('limit', type=int),
+        shuffle=request.args.get('shuffle', '0') not in ('0', 'false', ''),
+        seed=request.args.get('seed'),
+    )
+    return json_bytes(body, etag)
 
 
 @app.route('/antidepressant-or-tolkien/random')
 async def drug_or_tolkien_random():
-    if not hasattr(app, 'drug_or_tolkien_js'):
-        with open('static/json/antidepressant_or_tolkien.json') as f:
-            app.drug_or_tolkien_js = json.load(f)
-    return random.choice(app.drug_or_tolkien_js)
+    """GET a random entry. Optional ``?type=drug|tolkien``."""
+    body = app.drug_or_tolkien.random(request.args.get('type'))
+    if body is None:
+        return '<samp>Nothing of that type</samp>', 404
+    return json_bytes(body)
 
 
 @app.route('/now-playing')
@@ -243,13 +756,11 @@ async def now_playing():
 
 @app.route('/keys')
 async def ssh_keys():
-    with open('static/txt/ssh_keys.txt') as f:
-        keys = f.read()
-    return Response(keys, content_type='text/plain')
+    return send_asset('keys') or abort(404)
 
 @app.route('/pgp/<key_file>')
 async def pgp_key(key_file):
-    return await send_from_directory('static/txt/pgp', key_file)
+    return send_asset(f'pgp/{key_file}') or await send_from_directory('static/txt/pgp', key_file)
 
 # central tendencies
 """
@@ -280,19 +791,61 @@ def send_error_message(e):
         message = f'{e.__class__.__name__}: {e}'
     else:
         message = str(e)
-    print(message)
+    app.logger.info(message)
     return {'code': 400, 'message': message}, 400
 
 
-def do_calc(data, what):
+async def load_body():
+    """Decode the request body according to its Content-Type.
+
+    ``application/octet-stream`` is raw little-endian float64s, ``text/csv`` is numbers separated by commas or
+    newlines (``header=present`` skips the first line), and anything else is JSON. All of them are parsed as the body
+    arrives (see :mod:`utils.bodies`), except JSON bodies under ``stream_body_size``, which are quicker to decode in
+    one go. Arrays of numbers come back as :class:`ArrayData` once they are long enough for NumPy, and as a list of
+    floats otherwise.
+    """
+    if request.mimetype == 'application/octet-stream':
+        values = await read_float64(request.body)
+    elif request.mimetype == 'text/csv':
+        values = await read_csv(request.body, header=request.mimetype_params.get('header') == 'present')
+    elif request.content_length is not None and request.content_length < stream_body_size:
+        return app.json.loads(await request.get_data())
+    else:
+        values = await read_json(request.body, app.json.loads)
+        if not isinstance(values, array):
+            return values
+    if len(values) >= numpy_threshold and (data := ArrayData.from_buffer(values)) is not None:
+        return data
+    return values.tolist()
+
+
+def array_calc(array, what, bins=10):
+    lookup = {
+        'mean': array.mean,
+        'median': array.median_grouped,
+        'mode': array.multimode,
+        'describe': lambda: array.describe(bins=bins)
+    }
+    try:
+        return {what: lookup[what]()}
+    except Exception as e:
+        return send_error_message(e)
+
+
+def do_calc(data, what, bins=10):
+    if isinstance(data, ArrayData):
+        return array_calc(data, what, bins)
     if not data:
         return send_error_message('Data is empty.')
     if type(data) != list:
         return send_error_message('Data must be an array.')
+    if len(data) >= numpy_threshold and (array := ArrayData.from_list(data)) is not None:
+        return array_calc(array, what, bins)
     if not all(x in (int, float) for x in map(type, data)) and not all(x == dict for x in map(type, data)):
         return send_error_message('Data must be an array of JSON objects, or an array of floats.')
     if type(data[0]) == dict:
-        arr = []
+        # Grouped data is never expanded into [mid] * frequency; see utils.stats.GroupedData.
+        grouped = GroupedData()
         interval = None
         for js in data:
             try:
@@ -302,81 +855,115 @@ def do_calc(data, what):
                 else:
                     if interval != js.get('interval') and interval != js['upper_limit'] - js['lower_limit']:
                         return send_error_message('Inconsistent class intervals.')
-                arr += [mid] * js['frequency']
-            except KeyError as e:
+                grouped.add(mid, js['frequency'])
+            except (KeyError, TypeError) as e:
                 return send_error_message(e)
-    else:
-        arr = [float(i) for i in data]
-        interval = 1
+        grouped.interval = interval
+        lookup = {
+            'mean': grouped.mean,
+            'median': grouped.median_grouped,
+            'mode': grouped.mode,
+            'describe': grouped.describe
+        }
+        try:
+            return {what: lookup[what]()}
+        except Exception as e:
+            return send_error_message(e)
+    arr = [float(i) for i in data]
+    interval = 1
     lookup = {
         'mean': statistics.mean,
         'median': lambda x: statistics.median_grouped(x, interval=interval),
-        'mode': statistics.multimode
+        'mode': statistics.multimode,
+        'describe': lambda x: describe(x, interval, bins)
     }
     try:
-        print(arr)
-        print({what: lookup[what](arr)})
         return {what: lookup[what](arr)}
     except Exception as e:
         return send_error_message(e)
 
 
-@app.route('/mode', methods=['POST'])
-@requires_auth
-async def do_mode():
+async def calc(data, what, bins=10):
+    """:func:`do_calc`, except that arrays of at least ``stats_offload_threshold`` numbers are worked out in the stats
+    process pool.
+    """
+    if app.stats_pool is None:
+        return do_calc(data, what, bins)
+    if isinstance(data, ArrayData):
+        values = data.values
+    elif type(data) == list and len(data) >= stats_offload_threshold:
+        if (values := ArrayData.from_list(data)) is not None:
+            values = values.values
+        elif all(x in (int, float) for x in map(type, data)):
+            values = array('d', data)
+        else:
+            return do_calc(data, what, bins)
+    else:
+        return do_calc(data, what, bins)
+    if len(values) < stats_offload_threshold:
+        return do_calc(data, what, bins)
     try:
-        data = json.loads(await request.data)
-    except Exception as e:
+        result = await app.stats_pool.run(what, values.tobytes(), use_numpy=len(values) >= numpy_threshold, bins=bins)
+    except Saturated as e:
+        return {'code': 429, 'message': str(e)}, 429, {'Retry-After': '1'}
+    except BudgetExceeded as e:
+        # the same data would run out of time again, so this isn't worth retrying
+        return {'code': 422, 'message': str(e)}, 422
+    except WorkerLost as e:
+        return {'code': 503, 'message': str(e)}, 503, {'Retry-After': '1'}
+    except statistics.StatisticsError as e:
         return send_error_message(e)
-    if not data:
-        return send_error_message('Data is empty.')
-    if type(data) != list:
-        return send_error_message('Data must be an array.')
-    if not all(x == dict for x in map(type, data)):
-        return do_calc(data, 'mode')
+    except Exception:
+        app.logger.exception('Offloaded %s failed', what)
+        return {'code': 500, 'message': 'Internal server error.'}, 500
+    return {what: result}
 
-    get_interval = lambda x: x.get('interval', (x['upper_limit'] - x['lower_limit']))
-    try:
-        interval = get_interval(data[0])
-        if not all(x == interval for x in map(get_interval, data)):
-            return send_error_message('Inconsistent class intervals.')
-    except KeyError as e:
-        return send_error_message(e)
 
+@app.route('/mode', methods=['POST'])
+@requires_auth
+async def do_mode():
     try:
-        data = sorted(data, key=lambda x: x.get('mid', x['lower_limit']))
-        modal_class = data.index(max(data, key=lambda x: x['frequency']))
-        ll = data[modal_class]['lower_limit']
-        one_less = modal_class - 1
-        one_more = modal_class + 1
-        print(data[modal_class]['frequency'], ll, data[one_more]['frequency'], data[one_less]['frequency'])
-    except KeyError as e:
+        data = await load_body()
+    except Exception as e:
         return send_error_message(e)
-    _mode = (((data[modal_class]['frequency'] - data[one_less]['frequency']) /
-             (2 * data[modal_class]['frequency'] - data[one_less]['frequency'] - data[one_more]['frequency']))
-             * interval) + ll
-    print(_mode)
-    return {'mode': _mode}
+    return await calc(data, 'mode')
 
 
 @app.route('/median', methods=['POST'])
 @requires_auth
 async def do_median():
     try:
-        data = json.loads(await request.data)
+        data = await load_body()
     except Exception as e:
         return send_error_message(e)
-    return do_calc(data, 'median')
+    return await calc(data, 'median')
 
 
 @app.route('/mean', methods=['POST'])
 @requires_auth
 async def do_mean():
     try:
-        data = json.loads(await request.data)
+        data = await load_body()
+    except Exception as e:
+        return send_error_message(e)
+    return await calc(data, 'mean')
+
+
+@app.route('/describe', methods=['POST'])
+@requires_auth
+async def do_describe():
+    """POST the same data as /mean or /median. Returns count, mean, variance and stdev, min/max, quartiles, the
+    grouped median, modes and a histogram with ``?bins=`` equal-width bins (10 by default), in one go.
+    """
+    bins = max(1, min(request.args.get('bins', 10, type=int), 1000))
+    try:
+        data = await load_body()
     except Exception as e:
         return send_error_message(e)
-    return do_calc(data, 'mean')
+    result = await calc(data, 'describe', bins)
+    if isinstance(result, dict):
+        return result['describe']
+    return result
 
 
 if __name__ == '__main__':
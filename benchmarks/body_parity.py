@@ -0,0 +1,83 @@
+"""Check that read_json accepts and rejects the same bodies as a one-shot JSON decode, however they are chunked.
+
+Every body is fed whole, then split at every one and two points, and the result (the numbers, or a rejection) must
+match ``json.loads``. Exits non-zero on any mismatch.
+
+    python -m benchmarks.body_parity
+"""
+import asyncio
+import json
+import sys
+
+from utils.bodies import read_json
+
+BODIES = [
+    b'[1,2,3]',
+    b'[1, 2.5, -3e2, 4E-1]',
+    b' [ 1 , 2 ] ',
+    b'[1]',
+    b'[-0.5]',
+    b'[1,]',
+    b'[1,,2]',
+    b'[1, ,2]',
+    b'[1 2]',
+    b'[1,2',
+    b'[1,2]]',
+    b'[1,2] x',
+    b'[1,true]',
+    b'[1,null]',
+    b'[1,"2"]',
+    b'[1,[2]]',
+    b'[1,{}]',
+]
+
+
+async def chunks(parts):
+    for part in parts:
+        yield part
+
+
+def splits(body):
+    yield [body]
+    for i in range(1, len(body)):
+        yield [body[:i], body[i:]]
+        for j in range(i + 1, len(body)):
+            yield [body[:i], body[i:j], body[j:]]
+
+
+def decode(parts):
+    try:
+        result = asyncio.run(read_json(chunks(parts), json.loads))
+    except ValueError:
+        return None
+    return [float(x) for x in result]
+
+
+def expected(body):
+    try:
+        result = json.loads(body)
+    except ValueError:
+        return None
+    if type(result) is not list or not all(type(x) in (int, float) for x in result):
+        return None
+    return [float(x) for x in result]
+
+
+def main():
+    failures = 0
+    cases = 0
+    for body in BODIES:
+        want = expected(body)
+        for parts in splits(body):
+            cases += 1
+            got = decode(parts)
+            if got != want:
+                failures += 1
+                if failures <= 5:
+                    print(f'{parts!r}: {got!r} != {want!r}')
+    print(f'{cases} chunkings of {len(BODIES)} bodies, {failures} mismatches')
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,35 @@
+"""Per-request cost of each DateParser tier used by /gestation.
+
+    python -m benchmarks.date_parsing
+"""
+import timeit
+
+from utils.time import DateParser, Time
+
+CASES = {
+    'fast: 2026-03-01': '2026-03-01',
+    'fast: 01 Mar 2026': '01 Mar 2026',
+    'memo: 3 weeks ago': '3 weeks ago',
+    'natural: 3 weeks ago': '3 weeks ago',
+}
+
+
+def main():
+    parser = DateParser()
+    parser.parse('3 weeks ago')
+    for name, argument in CASES.items():
+        if name.startswith('natural'):
+            func = lambda: DateParser().parse(argument)
+        else:
+            func = lambda: parser.parse(argument)
+        number = 200 if name.startswith('natural') else 20000
+        best = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f'{name:<24}{best * 1e6:10.1f} us')
+    # what every request paid before
+    number = 200
+    best = min(timeit.repeat(lambda: Time('01 Mar 2026'), number=number, repeat=5)) / number
+    print(f'{"old: Time(01 Mar 2026)":<24}{best * 1e6:10.1f} us')
+
+
+if __name__ == '__main__':
+    main()
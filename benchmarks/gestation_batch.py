@@ -0,0 +1,28 @@
+"""gestation_many against one gestation() call per date, for /gestation/batch-sized inputs.
+
+Realistic batches are LMPs from the last 40 weeks, so dates repeat; the wide spread is the worst case for the memo.
+
+    python -m benchmarks.gestation_batch
+"""
+import datetime
+import random
+import timeit
+
+from utils.gestation import gestation, gestation_many
+
+
+def main():
+    today = datetime.date.today()
+    rng = random.Random(0)
+    for spread in (280, 20000):
+        for size in (100, 1000, 10000):
+            lmps = [today - datetime.timedelta(days=rng.randrange(1, spread)) for _ in range(size)]
+            number = max(1, 20000 // size)
+            per_date = min(timeit.repeat(lambda: [gestation(lmp, today) for lmp in lmps], number=number, repeat=5))
+            batched = min(timeit.repeat(lambda: gestation_many(lmps, today), number=number, repeat=5))
+            print(f'spread {spread:>5} days, n={size:<6}per date {per_date / number * 1000:8.2f} ms   '
+                  f'gestation_many {batched / number * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
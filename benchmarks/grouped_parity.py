@@ -0,0 +1,72 @@
+"""Check that GroupedData gives the same answers as statistics on the expanded ``[mid] * frequency`` list.
+
+Runs random class tables (int and float mids, repeated mids, zero frequencies, one class) and exits non-zero on the
+first few mismatches.
+
+    python -m benchmarks.grouped_parity
+    python -m benchmarks.grouped_parity --cases 100000 --seed 7
+"""
+import argparse
+import random
+import statistics
+import sys
+
+from utils.stats import GroupedData
+
+
+def random_pairs(rng):
+    classes = rng.randrange(1, 12)
+    if rng.random() < 0.5:
+        mids = [rng.randrange(-50, 200) for _ in range(classes)]
+    else:
+        mids = [round(rng.uniform(-50, 200), rng.randrange(0, 4)) for _ in range(classes)]
+    if rng.random() < 0.3:
+        # shared mids are one class as far as the median and mode are concerned
+        mids += rng.choices(mids, k=rng.randrange(1, 4))
+    return [(mid, rng.randrange(0, 40)) for mid in mids]
+
+
+def compare(pairs, interval):
+    """Mismatches as ``(name, grouped, expected)``."""
+    expanded = [mid for mid, frequency in pairs for _ in range(frequency)]
+    grouped = GroupedData(pairs, interval)
+    checks = {
+        'mean': (grouped.mean, lambda: statistics.mean(expanded)),
+        'median_grouped': (grouped.median_grouped, lambda: statistics.median_grouped(expanded, interval)),
+        'multimode': (grouped.multimode, lambda: statistics.multimode(expanded)),
+    }
+    mismatches = []
+    for name, (ours, theirs) in checks.items():
+        try:
+            expected = theirs()
+        except statistics.StatisticsError:
+            expected = statistics.StatisticsError
+        try:
+            got = ours()
+        except statistics.StatisticsError:
+            got = statistics.StatisticsError
+        if got != expected or type(got) is not type(expected):
+            mismatches.append((name, got, expected))
+    return mismatches
+
+
+def main(cases, seed):
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(cases):
+        pairs = random_pairs(rng)
+        interval = rng.choice((1, 2, 5, 10, 0.5))
+        for name, got, expected in compare(pairs, interval):
+            failures += 1
+            if failures <= 5:
+                print(f'{name}: {got!r} != {expected!r} for {pairs} (interval {interval})')
+    print(f'{cases} cases, {failures} mismatches')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare GroupedData with statistics on random inputs.')
+    parser.add_argument('--cases', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    sys.exit(1 if main(args.cases, args.seed) else 0)
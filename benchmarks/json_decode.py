@@ -0,0 +1,42 @@
+"""Compare request-body decoding for /mean, /median and /mode.
+
+Run from the repository root: ``python -m benchmarks.json_decode``
+"""
+import asyncio
+import json
+import random
+import timeit
+
+from utils.bodies import read_json
+from utils.stats import ArrayData
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+async def chunked(body, size=64 * 1024):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def main():
+    for n in (10 ** 5, 10 ** 6):
+        body = json.dumps([random.uniform(-1e3, 1e3) for _ in range(n)]).encode()
+        cases = {
+            'json.loads': lambda: json.loads(body),
+            'json + from_list': lambda: ArrayData.from_list(json.loads(body)),
+            'read_json (streamed)': lambda: asyncio.run(read_json(chunked(body), json.loads)),
+        }
+        if orjson is not None:
+            cases['orjson.loads'] = lambda: orjson.loads(body)
+            cases['orjson + from_list'] = lambda: ArrayData.from_list(orjson.loads(body))
+        print(f'n = {n} ({len(body) / 1e6:.1f} MB)')
+        for name, func in cases.items():
+            best = min(timeit.repeat(func, number=1, repeat=5))
+            print(f'  {name:<22}{best * 1000:>10.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
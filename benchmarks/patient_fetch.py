@@ -0,0 +1,65 @@
+"""Compare loading /patients/<id> with separate queries against Patient.fetch.
+
+Needs a throwaway database; the tables from schema.sql are created if missing and the seeded rows are removed
+afterwards.
+
+    python -m benchmarks.patient_fetch postgresql://postgres@localhost/med_bench [history_length]
+"""
+import asyncio
+import datetime
+import statistics
+import sys
+import time
+
+import asyncpg
+
+from models import Patient
+
+
+async def separate_queries(con, patient_id):
+    record = await con.fetchrow('SELECT * FROM patients WHERE id = $1;', patient_id)
+    patient = Patient.build_from_record(record)
+    await patient.fetch_history(con=con)
+    await patient.get_next_of_kin(con=con)
+    return patient
+
+
+async def single_query(con, patient_id):
+    return await Patient.fetch(patient_id, con=con)
+
+
+async def main(dsn, history_length):
+    pool = await asyncpg.create_pool(dsn)
+    with open('schema.sql') as f:
+        await pool.execute(f.read())
+    async with pool.acquire() as con:
+        nok_id = await con.fetchval("INSERT INTO relations (name, age, sex, occupation) "
+                                    "VALUES ('bench', 40, 'F', 'bench') RETURNING id;")
+        patient_id = await con.fetchval("INSERT INTO patients (name, age, sex, occupation, date_of_admission, "
+                                        "next_of_kin_id) VALUES ('bench', 30, 'M', 'bench', $1, $2) RETURNING id;",
+                                        datetime.date.today(), nok_id)
+        start = datetime.date.today() - datetime.timedelta(days=history_length)
+        await con.copy_records_to_table(
+            'examinations', columns=('patient_id', 'date', 'summary', 'details'),
+            records=[(patient_id, start + datetime.timedelta(days=i), f'exam {i}', 'x' * 200)
+                     for i in range(history_length)])
+    try:
+        for name, func in (('separate queries', separate_queries), ('Patient.fetch', single_query)):
+            timings = []
+            for _ in range(200):
+                begin = time.perf_counter()
+                async with pool.acquire() as con:
+                    await func(con, patient_id)
+                timings.append(time.perf_counter() - begin)
+            timings.sort()
+            print(f'{name:<18} p50 {statistics.median(timings) * 1000:7.2f} ms   '
+                  f'p99 {timings[int(len(timings) * 0.99)] * 1000:7.2f} ms')
+    finally:
+        await pool.execute('DELETE FROM examinations WHERE patient_id = $1;', patient_id)
+        await pool.execute('DELETE FROM patients WHERE id = $1;', patient_id)
+        await pool.execute('DELETE FROM relations WHERE id = $1;', nok_id)
+        await pool.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 50))
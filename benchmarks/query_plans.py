@@ -0,0 +1,59 @@
+"""Check that the hot queries use the indexes from migrations/ on a seeded database.
+
+Everything happens in a scratch ``plan_check`` schema which is dropped afterwards. Exits non-zero if any query
+falls back to a sequential scan of a seeded table.
+
+    python -m benchmarks.query_plans postgresql://postgres@localhost/med_bench
+"""
+import asyncio
+import json
+import sys
+
+import asyncpg
+
+from migrate import migrate
+
+QUERIES = {
+    'Patient.fetch_history': ('SELECT * FROM examinations WHERE patient_id = $1 ORDER BY date DESC, id DESC;', 1234),
+    'TokenUtils.validate_token': ('SELECT secret FROM api_tokens WHERE user_id = $1 AND app_id = $2;', 1234, 1234),
+    'TokenUtils.delete_user_account': ('SELECT app_id FROM api_tokens WHERE user_id = $1;', 1234),
+    'next of kin lookup': ('SELECT id FROM patients WHERE next_of_kin_id = $1;', 1234),
+}
+
+
+def scans(plan):
+    yield plan['Node Type'], plan.get('Relation Name')
+    for child in plan.get('Plans', ()):
+        yield from scans(child)
+
+
+async def main(dsn):
+    con = await asyncpg.connect(dsn)
+    failed = False
+    try:
+        await con.execute('DROP SCHEMA IF EXISTS plan_check CASCADE; CREATE SCHEMA plan_check; '
+                          'SET search_path TO plan_check;')
+        await migrate(con)
+        await con.execute("""
+            INSERT INTO relations (name) SELECT 'relation ' || i FROM generate_series(1, 20000) i;
+            INSERT INTO patients (name, next_of_kin_id) SELECT 'patient ' || i, i FROM generate_series(1, 20000) i;
+            INSERT INTO examinations (patient_id, date, summary)
+                SELECT 1 + i % 20000, current_date - (i % 3650), 'exam ' || i FROM generate_series(1, 200000) i;
+            INSERT INTO api_tokens (user_id, app_name, secret)
+                SELECT i % 5000, 'app ' || i, '\\x00' FROM generate_series(1, 20000) i;
+            ANALYZE;
+        """)
+        for name, (query, *args) in QUERIES.items():
+            plan = json.loads(await con.fetchval(f'EXPLAIN (FORMAT JSON) {query}', *args))[0]['Plan']
+            nodes = list(scans(plan))
+            ok = not any(node == 'Seq Scan' for node, _ in nodes)
+            failed |= not ok
+            print(f'{"ok" if ok else "SEQ SCAN":<9}{name:<34}{", ".join(f"{n} on {r}" for n, r in nodes if r)}')
+    finally:
+        await con.execute('DROP SCHEMA IF EXISTS plan_check CASCADE;')
+        await con.close()
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(sys.argv[1])))
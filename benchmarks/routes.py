@@ -0,0 +1,229 @@
+"""Throughput and p50/p99 latency for every route, with the app running in-process.
+
+Needs a throwaway database: it is migrated with migrate.py, seeded with bench patients (one with a long examination
+history) and cleaned up afterwards. The cat/dog CDNs and Last.fm are replaced by a local aiohttp stub, so nothing
+leaves the machine. Results go to stdout, and with ``--json`` to a file that can be diffed across commits.
+
+    python -m benchmarks.routes postgresql://postgres@localhost/med_bench --json bench.json
+    python -m benchmarks.routes postgresql://postgres@localhost/med_bench --only /mean --requests 50
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import random
+import subprocess
+import time
+
+import aiohttp.web
+import asyncpg
+
+import config
+
+MEDIA = bytes(random.Random(0).getrandbits(8) for _ in range(256 * 1024))
+
+
+async def start_stubs():
+    """cat_cdn, dog_db, dog_cdn and Last.fm on one local port. Returns ``(runner, base_url)``."""
+    base = None
+
+    async def cat(request):
+        return aiohttp.web.json_response([{'url': f'{base}/media/cat.jpg'}])
+
+    async def dog(request):
+        return aiohttp.web.Response(text='dog.jpg')
+
+    async def media(request):
+        return aiohttp.web.Response(body=MEDIA, content_type='image/jpeg')
+
+    async def lastfm(request):
+        return aiohttp.web.json_response({'recenttracks': {'track': [
+            {'name': 'Bench', 'artist': {'#text': 'Stub'}, '@attr': {'nowplaying': 'true'}}]}})
+
+    stub = aiohttp.web.Application()
+    stub.router.add_get('/cat', cat)
+    stub.router.add_get('/dog', dog)
+    stub.router.add_get('/media/{name}', media)
+    stub.router.add_get('/lastfm', lastfm)
+    runner = aiohttp.web.AppRunner(stub, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f'http://127.0.0.1:{port}'
+    return runner, base
+
+
+async def seed(dsn, history_length, patient_count):
+    """Returns ``(small_id, large_id, exam_id)``: patients with 10 and ``history_length`` examinations, and one of the
+    small patient's examinations.
+    """
+    from migrate import migrate
+
+    con = await asyncpg.connect(dsn)
+    try:
+        await migrate(con)
+        nok_id = await con.fetchval("INSERT INTO relations (name, age, sex, occupation) "
+                                    "VALUES ('bench', 40, 'F', 'bench') RETURNING id;")
+        today = datetime.date.today()
+        await con.copy_records_to_table(
+            'patients', columns=('name', 'age', 'sex', 'occupation', 'date_of_admission', 'next_of_kin_id'),
+            records=[('bench', 20 + i % 60, 'MF'[i % 2], 'bench', today, nok_id) for i in range(patient_count)])
+        small_id, large_id = await con.fetchval("SELECT array_agg(id) FROM (SELECT id FROM patients "
+                                                "WHERE name = 'bench' ORDER BY id LIMIT 2) p;")
+        start = today - datetime.timedelta(days=history_length)
+        records = [(small_id, start + datetime.timedelta(days=i), f'exam {i}', 'x' * 200) for i in range(10)]
+        records += [(large_id, start + datetime.timedelta(days=i), f'exam {i}', 'x' * 200)
+                    for i in range(history_length)]
+        await con.copy_records_to_table('examinations', columns=('patient_id', 'date', 'summary', 'details'),
+                                        records=records)
+        exam_id = await con.fetchval('SELECT min(id) FROM examinations WHERE patient_id = $1;', small_id)
+    finally:
+        await con.close()
+    return small_id, large_id, exam_id
+
+
+async def cleanup(dsn):
+    con = await asyncpg.connect(dsn)
+    try:
+        await con.execute("DELETE FROM examinations "
+                          "WHERE patient_id IN (SELECT id FROM patients WHERE name = 'bench');")
+        await con.execute("DELETE FROM patients WHERE name = 'bench';")
+        await con.execute("DELETE FROM relations WHERE name = 'bench';")
+    finally:
+        await con.close()
+
+
+def scenarios(small_id, large_id, exam_id, token):
+    """``(name, method, path, headers, body, requests)`` for every route. ``requests`` scales the run length down for
+    the expensive ones.
+    """
+    key = {'Authorization': config.api_key}
+    auth = {'Authorization': token}
+    rng = random.Random(0)
+    lmps = [(datetime.date.today() - datetime.timedelta(days=rng.randrange(1, 280))).strftime('%d %b %Y')
+            for _ in range(1000)]
+    grouped = [{'lower_limit': i * 10, 'upper_limit': i * 10 + 10, 'frequency': rng.randrange(1, 100)}
+               for i in range(50)]
+    yield '/', 'GET', '/', {}, None, 1
+    yield '/keys', 'GET', '/keys', {'Accept-Encoding': 'gzip'}, None, 1
+    yield '/pgp/<key_file>', 'GET', '/pgp/all.asc', {}, None, 1
+    yield '/terms', 'GET', '/terms', {}, None, 1
+    yield '/tokens', 'GET', '/tokens', {}, None, 1
+    yield '/gestation', 'GET', '/gestation?lmp=3+weeks+ago', auth, None, 1
+    yield '/gestation/batch', 'POST', '/gestation/batch', auth, json.dumps(lmps).encode(), 0.1
+    for size in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+        # two decimals keeps 10^6 values under Quart's default 16 MiB MAX_CONTENT_LENGTH
+        body = json.dumps([round(rng.random() * 100, 2) for _ in range(size)]).encode()
+        yield f'/mean n={size}', 'POST', '/mean', auth, body, min(1, 1000 / size)
+    ints = json.dumps([rng.randrange(100) for _ in range(10 ** 4)]).encode()
+    yield '/median n=10000', 'POST', '/median', auth, ints, 0.1
+    yield '/mode n=10000', 'POST', '/mode', auth, ints, 0.1
+    yield '/mean grouped', 'POST', '/mean', auth, json.dumps(grouped).encode(), 1
+    yield '/mode grouped', 'POST', '/mode', auth, json.dumps(grouped).encode(), 1
+    yield '/patients/<id> small', 'GET', f'/patients/{small_id}', key, None, 1
+    yield '/patients/<id> large', 'GET', f'/patients/{large_id}', key, None, 0.1
+    yield '/patients/<id>/<exam_id>', 'GET', f'/patients/{small_id}/{exam_id}', key, None, 1
+    yield '/patients page', 'GET', '/patients?limit=500', key, None, 0.2
+    yield '/patients stream', 'GET', '/patients', key, None, 0.05
+    yield '/antidepressant-or-tolkien/all', 'GET', '/antidepressant-or-tolkien/all', {}, None, 1
+    yield '/antidepressant-or-tolkien/random', 'GET', '/antidepressant-or-tolkien/random', {}, None, 1
+    yield '/now-playing', 'GET', '/now-playing', {}, None, 1
+    yield '/cat', 'GET', '/cat', {}, None, 0.2
+    yield '/dog', 'GET', '/dog', {}, None, 0.2
+    yield '/metrics', 'GET', '/metrics', key, None, 0.2
+
+
+async def run(client, method, path, headers, body, requests, concurrency):
+    timings = []
+    statuses = {}
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            begin = time.perf_counter()
+            response = await client.open(path, method=method, headers=headers, data=body)
+            await response.get_data()
+            timings.append(time.perf_counter() - begin)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    # warm caches and statement preparation outside the measurement
+    for _ in range(min(3, requests)):
+        await (await client.open(path, method=method, headers=headers, data=body)).get_data()
+    begin = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - begin
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'rps': len(timings) / elapsed,
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'p99_ms': timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1000,
+        'max_ms': timings[-1] * 1000,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    runner, base = await start_stubs()
+    # the app reads these at import time
+    config.postgresql = args.dsn
+    config.cat_cdn = f'{base}/cat'
+    config.dog_db = f'{base}/dog'
+    config.dog_cdn = f'{base}/media'
+    config.fm_api_url = f'{base}/lastfm'
+    config.fm_username = config.fm_api_key = 'bench'
+    config.media_cache_dir = None
+    config.static_reload_interval = 0
+    import app
+
+    ids = await seed(args.dsn, args.history, args.patients)
+    results = {}
+    try:
+        async with app.app.test_app() as test_app:
+            token = (await app.token_handler.new_token(args.user_id, 'bench')).decode()
+            client = test_app.test_client()
+            for name, method, path, headers, body, scale in scenarios(*ids, token):
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                requests = max(5, int(args.requests * scale))
+                results[name] = result = await run(client, method, path, headers, body, requests, args.concurrency)
+                print(f'{name:<36}{result["rps"]:9.1f} req/s   p50 {result["p50_ms"]:8.2f} ms   '
+                      f'p99 {result["p99_ms"]:8.2f} ms   {result["statuses"]}')
+            await app.token_handler.delete_user_account(args.user_id)
+    finally:
+        await cleanup(args.dsn)
+        await runner.cleanup()
+
+    if args.json:
+        report = {
+            'commit': git_revision(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'concurrency': args.concurrency,
+            'history': args.history,
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark every route in-process.')
+    parser.add_argument('dsn', help='throwaway database to seed and benchmark against')
+    parser.add_argument('--requests', type=int, default=500, help='requests per route (scaled down for slow ones)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--history', type=int, default=5000, help='examinations on the large patient')
+    parser.add_argument('--patients', type=int, default=2000, help='bench patients for the /patients listing')
+    parser.add_argument('--only', action='append', help='only routes whose name starts with this (repeatable)')
+    parser.add_argument('--user-id', type=int, default=987654321, help='token owner; removed afterwards')
+    parser.add_argument('--json', help='also write results to this file')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,36 @@
+"""Import time and resident memory of a worker importing app.py, with and without discord.py loaded.
+
+``python -X importtime`` is used for the timings; the "+ discord" row shows what every worker paid before the Discord
+converters moved to utils.time_converters.
+
+    python -m benchmarks.startup
+"""
+import re
+import subprocess
+import sys
+
+SNIPPETS = {
+    'import app': 'import app',
+    'import app + discord': 'import app, discord.ext.commands',
+}
+RSS = 'import resource, sys; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "discord" in sys.modules)'
+
+
+def measure(code):
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+    # the last line is the outermost import; its cumulative time covers everything it pulled in
+    total = sum(int(m['cumulative']) for m in re.finditer(r'import time:\s+\d+ \|\s+(?P<cumulative>\d+) \| (?P<n>\S.*)$',
+                                                          out.stderr, re.M) if not m['n'].startswith(' '))
+    rss = subprocess.run([sys.executable, '-c', f'{code}; {RSS}'], capture_output=True, text=True, check=True)
+    maxrss, discord = rss.stdout.split()
+    return total / 1000, int(maxrss) / 1024, discord == 'True'
+
+
+def main():
+    for name, code in SNIPPETS.items():
+        ms, mib, discord = min(measure(code) for _ in range(5))
+        print(f'{name:<24}{ms:8.1f} ms {mib:8.1f} MiB   discord.py loaded: {discord}')
+
+
+if __name__ == '__main__':
+    main()
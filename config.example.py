@@ -6,3 +6,36 @@ dog_db = ''  # a web app endpoint that spits out a random filename of a dog phot
 # you can use a database here, but I don't want to add a table to the existing database just for dogposts
 dog_cdn = ''  # the actual CDN server that serves the dog media.
 # Instead of these two separate things, you can use a public API.
+token_cache_size = 1024  # max number of (user_id, app_id) pairs kept in the verified-token cache.
+token_cache_ttl = 300  # seconds before a cached token is re-checked against the database.
+numpy_threshold = 10000  # arrays at least this long go through NumPy (if installed): /mean, /median, /mode, /describe.
+media_chunk_size = 64 * 1024  # bytes held in memory per /cat or /dog request while streaming from the CDN.
+media_timeout = 10  # seconds to connect to the cat/dog CDNs, and between reads while streaming. Failures are a 502.
+media_cache_dir = 'cache/media'  # on-disk cache for cat/dog media. Set to None to always go to the CDN.
+media_cache_size = 512 * 1024 * 1024  # bytes; least recently served files are evicted beyond this.
+media_prefetch = 0  # number of random cats and dogs to keep on disk so requests never wait on the CDN.
+patients_page_size = 500  # max ?limit= for GET /patients and GET /patients/<id>, and rows fetched per round-trip when streaming.
+pool_min_size = 10  # asyncpg pool sizing; hot statements are parsed once on every new connection.
+pool_max_size = 10
+statement_cache_size = 100  # per-connection asyncpg statement cache. Set to 0 behind pgbouncer in transaction mode.
+pool_max_inactive_lifetime = 300.0  # seconds an idle connection is kept before being closed.
+date_parse_cache_size = 1024  # natural-language /gestation dates remembered per day.
+gestation_batch_limit = 10000  # max dates per POST /gestation/batch.
+fm_username = ''  # Last.fm account shown on /now-playing.
+fm_api_key = ''
+fm_api_url = 'https://ws.audioscrobbler.com/2.0/'
+fm_max_age = 60  # seconds before /now-playing refreshes from Last.fm; the old value is served meanwhile.
+fm_background_refresh = False  # refresh every fm_max_age seconds from a background task instead of on demand.
+static_max_age = 86400  # Cache-Control max-age for /keys, /pgp/*, /terms, /tokens and keybase.txt.
+static_reload_interval = 5  # seconds between checks for changed static files on disk. 0 loads them once at startup.
+compress_min_size = 1024  # bytes; smaller JSON/text responses are sent uncompressed.
+compress_thread_threshold = 256 * 1024  # bytes; larger bodies are compressed off the event loop.
+compress_workers = 2  # threads used for compressing large bodies.
+bulk_limit = 10000  # max rows per POST /patients/bulk or /patients/<id>/exams/bulk.
+stats_workers = 2  # worker processes for large /mean, /median and /mode bodies. 0 computes everything in the web worker.
+stats_offload_threshold = 100000  # arrays at least this long go to the worker processes.
+stats_queue_depth = 4  # large jobs allowed to wait for a worker before new ones get a 429.
+stats_cpu_budget = 5.0  # seconds of CPU time a single large job may use.
+stream_body_size = 1024 * 1024  # bytes; bigger (or chunked) JSON bodies for /mean, /median, /mode are parsed as they arrive.
+patient_cache_size = 64 * 1024 * 1024  # bytes of GET /patients/<id> payloads cached per worker. Inactive until migration 0003 is applied. 0 disables.
+# Needs migrations/0003 (python migrate.py) and one extra database connection per worker for LISTEN.
@@ -0,0 +1,83 @@
+"""Apply schema.sql and any pending migrations in migrations/ to config.postgresql.
+
+Migrations are named ``NNNN_description.sql`` and applied in order, each in its own transaction. A migration whose
+first line is ``-- no-transaction`` (needed for CREATE INDEX CONCURRENTLY) is run one statement at a time instead.
+
+    python migrate.py            apply everything pending
+    python migrate.py --status   list migrations and whether they have been applied
+"""
+import argparse
+import asyncio
+import os
+import re
+
+import asyncpg
+
+import config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+FILENAME = re.compile(r'^(?P<version>\d+)_(?P<name>\w+)\.sql$')
+
+
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = FILENAME.match(filename)
+        if match is None:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            sql = f.read()
+        migrations.append((int(match['version']), match['name'], sql))
+    return migrations
+
+
+def split_statements(sql):
+    """Naive split on ``;``. Good enough for migrations without semicolons inside literals."""
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+async def applied_versions(con):
+    await con.execute('CREATE TABLE IF NOT EXISTS schema_migrations ('
+                      'version INTEGER PRIMARY KEY, name TEXT, applied_at TIMESTAMPTZ NOT NULL DEFAULT now());')
+    return {row['version'] for row in await con.fetch('SELECT version FROM schema_migrations;')}
+
+
+async def apply(con, version, name, sql):
+    record = 'INSERT INTO schema_migrations (version, name) VALUES ($1, $2);'
+    if sql.startswith('-- no-transaction'):
+        for statement in split_statements(sql):
+            await con.execute(statement)
+        await con.execute(record, version, name)
+    else:
+        async with con.transaction():
+            await con.execute(sql)
+            await con.execute(record, version, name)
+
+
+async def migrate(con, status=False):
+    with open(SCHEMA) as f:
+        await con.execute(f.read())
+    done = await applied_versions(con)
+    for version, name, sql in load_migrations():
+        if status:
+            print(f'{version:04d} {name}: {"applied" if version in done else "pending"}')
+        elif version not in done:
+            print(f'applying {version:04d} {name}')
+            await apply(con, version, name, sql)
+
+
+async def main(status=False):
+    con = await asyncpg.connect(config.postgresql)
+    try:
+        await migrate(con, status)
+    finally:
+        await con.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply database migrations.')
+    parser.add_argument('--status', action='store_true', help='only list migrations')
+    args = parser.parse_args()
+    asyncio.run(main(args.status))
@@ -0,0 +1,12 @@
+-- no-transaction
+-- Built CONCURRENTLY so writes aren't blocked. If a build fails, Postgres leaves an INVALID index behind: drop it
+-- with DROP INDEX CONCURRENTLY and re-run migrate.py.
+
+-- Patient.fetch / fetch_history: WHERE patient_id = $1 ORDER BY date DESC, id DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS examinations_patient_id_date_idx ON examinations (patient_id, date DESC, id DESC);
+
+-- TokenUtils: lookups by (user_id, app_id) and delete_user_account by user_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS api_tokens_user_id_app_id_idx ON api_tokens (user_id, app_id);
+
+-- joins from patients to relations, and the foreign key check when a relation is deleted
+CREATE INDEX CONCURRENTLY IF NOT EXISTS patients_next_of_kin_id_idx ON patients (next_of_kin_id);
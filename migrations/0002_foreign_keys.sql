@@ -0,0 +1,11 @@
+-- Added NOT VALID so existing rows aren't checked while the ADD CONSTRAINT locks are held; 0004 validates them
+-- afterwards, which only blocks schema changes. Next of kin pointing at relations that don't exist are cleared;
+-- orphaned examinations are left alone and will make the validation fail so they can be looked at by hand.
+
+UPDATE patients SET next_of_kin_id = NULL
+WHERE next_of_kin_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM relations r WHERE r.id = patients.next_of_kin_id);
+
+ALTER TABLE patients ADD CONSTRAINT patients_next_of_kin_id_fkey
+    FOREIGN KEY (next_of_kin_id) REFERENCES relations (id) ON DELETE SET NULL NOT VALID;
+ALTER TABLE examinations ADD CONSTRAINT examinations_patient_id_fkey
+    FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE NOT VALID;
@@ -0,0 +1,34 @@
+-- NOTIFY patient_changed with the patient's id whenever anything in their GET /patients/<id> payload changes, so
+-- every worker can drop its cached copy (see utils/patient_cache.py). Identical notifications within a transaction
+-- are delivered once, so a bulk load of one patient's examinations sends a single message.
+
+CREATE OR REPLACE FUNCTION notify_patient_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'examinations' THEN
+        IF TG_OP <> 'INSERT' AND OLD.patient_id IS NOT NULL THEN
+            PERFORM pg_notify('patient_changed', OLD.patient_id::text);
+        END IF;
+        IF TG_OP <> 'DELETE' AND NEW.patient_id IS NOT NULL THEN
+            PERFORM pg_notify('patient_changed', NEW.patient_id::text);
+        END IF;
+    ELSIF TG_TABLE_NAME = 'patients' THEN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('patient_changed', OLD.id::text);
+        ELSE
+            PERFORM pg_notify('patient_changed', NEW.id::text);
+        END IF;
+    ELSE
+        -- relations: everyone who has them as next of kin
+        PERFORM pg_notify('patient_changed', p.id::text) FROM patients p WHERE p.next_of_kin_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER examinations_notify_patient AFTER INSERT OR UPDATE OR DELETE ON examinations
+    FOR EACH ROW EXECUTE FUNCTION notify_patient_changed();
+CREATE TRIGGER patients_notify_patient AFTER INSERT OR UPDATE OR DELETE ON patients
+    FOR EACH ROW EXECUTE FUNCTION notify_patient_changed();
+-- deleting a relation nulls next_of_kin_id, which the patients trigger already covers
+CREATE TRIGGER relations_notify_patient AFTER UPDATE ON relations
+    FOR EACH ROW EXECUTE FUNCTION notify_patient_changed();
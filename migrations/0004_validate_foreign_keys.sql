@@ -0,0 +1,7 @@
+-- no-transaction
+-- Validates the constraints from 0002. Each statement commits on its own, so the scans run under SHARE UPDATE
+-- EXCLUSIVE only and writes carry on; nothing from 0002's ADD CONSTRAINT is still held. A no-op where 0002 already
+-- validated them.
+
+ALTER TABLE patients VALIDATE CONSTRAINT patients_next_of_kin_id_fkey;
+ALTER TABLE examinations VALIDATE CONSTRAINT examinations_patient_id_fkey;
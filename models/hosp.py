@@ -1,8 +1,10 @@
 from dataclasses import dataclass
 import datetime
-from typing import List
+from typing import List, Tuple
 import asyncpg
 
+from utils.queries import queries
+
 
 @dataclass
 class Examination:
@@ -17,17 +19,20 @@ class Examination:
         return cls(id=record['id'], date=record['date'], summary=record['summary'], details=record['details'], patient_id=record['patient_id'])
 
     async def amend(self, *, con: asyncpg.Connection, summary=None, details=None):
-        data = []
-        if summary is not None:
-            data.append({'summary': summary})
-        if details is not None:
-            data.append({'details': details})
-        if not data:
-            return
-        query = f"UPDATE examinations SET {', '.join(f'{x} = ${i + 2}' for i, x in enumerate(data.keys()))} WHERE id = $1 RETURNING *;"
-        rec = await con.fetchrow(query, self.id *data.values())
-        self = self.build_from_record(rec)
-        return self
+        if summary is None and details is None:
+            return self
+        rec = await queries.fetchrow(con, 'examinations.amend', self.id, summary, details)
+        return self.build_from_record(rec)
+
+    @classmethod
+    async def insert_many(cls, patient_id: int, rows, *, con: asyncpg.Connection):
+        """COPY ``(date, summary, details)`` rows into a patient's history. Returns the new ids, in order."""
+        async with con.transaction():
+            ids = [record[0] for record in await queries.fetch(con, 'ids.reserve', 'examinations', len(rows))]
+            await con.copy_records_to_table(
+                'examinations', columns=('id', 'patient_id', 'date', 'summary', 'details'),
+                records=[(exam_id, patient_id, *row) for exam_id, row in zip(ids, rows)])
+        return ids
 
 @dataclass
 class Person:
@@ -61,27 +66,82 @@ class Patient(Person):
         self.next_of_kin_id = record['next_of_kin_id']
         return cls(**self.__dict__)
 
+    @classmethod
+    async def fetch(cls, patient_id: int, *, con: asyncpg.Connection, limit: int = None,
+                    before: Tuple[datetime.date, int] = None, since: int = 0, details: bool = True):
+        """Load a patient with their next of kin and history, newest examination first.
+
+        By default the whole history comes back in a single round-trip, as one array per column (see
+        ``patients.fetch`` in :mod:`utils.queries`), which asyncpg decodes much faster than an array of rows.
+        Otherwise only part of it is loaded: at most ``limit`` examinations, only those older than ``before`` (a
+        ``(date, id)`` pair, as in the ordering; ``date`` is ``None`` for an undated examination, which sorts before
+        every dated one), only those with an id above ``since``, and without ``details``
+        (left as ``None``) unless asked for.
+        Returns ``None`` if there is no such patient.
+        """
+        if limit is None and before is None and not since and details:
+            record = await queries.fetchrow(con, 'patients.fetch', patient_id)
+        else:
+            record = await queries.fetchrow(con, 'patients.get', patient_id)
+        if record is None:
+            return None
+        self = cls.build_from_record(record)
+        if record['nok_id'] is not None:
+            self.next_of_kin = Person(record['nok_id'], record['nok_name'], record['nok_age'], record['nok_sex'],
+                                      record['nok_occupation'])
+        if 'exam_ids' not in record.keys():
+            if before is None:
+                records = await queries.fetch(con, 'examinations.page', patient_id, since, details, limit)
+            elif before[0] is None:
+                records = await queries.fetch(con, 'examinations.page_before_undated', patient_id, since, details,
+                                              limit, before[1])
+            else:
+                records = await queries.fetch(con, 'examinations.page_before', patient_id, since, details, limit,
+                                              *before)
+            self.history = [Examination.build_from_record(record) for record in records]
+        elif record['exam_ids'] is not None:
+            columns = zip(record['exam_ids'], record['exam_dates'], record['exam_summaries'], record['exam_details'])
+            self.history = [Examination(id=exam_id, patient_id=self.id, date=date, summary=summary, details=details)
+                            for exam_id, date, summary, details in columns]
+        return self
+
+    @classmethod
+    async def insert_many(cls, rows, *, con: asyncpg.Connection):
+        """COPY ``(patient, next_of_kin)`` rows (see :func:`utils.bulk.patient_row`) in one transaction.
+
+        Returns the new patient ids, in order.
+        """
+        async with con.transaction():
+            nok_ids = [record[0] for record in await queries.fetch(con, 'ids.reserve', 'relations', len(rows))]
+            ids = [record[0] for record in await queries.fetch(con, 'ids.reserve', 'patients', len(rows))]
+            await con.copy_records_to_table(
+                'relations', columns=('id', 'name', 'age', 'sex', 'occupation'),
+                records=[(nok_id, *nok) for nok_id, (_, nok) in zip(nok_ids, rows)])
+            await con.copy_records_to_table(
+                'patients', columns=('id', 'name', 'age', 'sex', 'occupation', 'date_of_admission', 'next_of_kin_id'),
+                records=[(patient_id, *patient, nok_id)
+                         for patient_id, nok_id, (patient, _) in zip(ids, nok_ids, rows)])
+        return ids
+
     async def get_next_of_kin(self, con: asyncpg.Connection):
         if self.next_of_kin is not None:
             return self.next_of_kin
-        query = 'SELECT * FROM relations WHERE id = $1;'
-        record = await con.fetchrow(query, self.next_of_kin_id)
+        record = await queries.fetchrow(con, 'relations.get', self.next_of_kin_id)
         self.next_of_kin = Person.build_from_record(record)
         return self.next_of_kin
 
     async def fetch_history(self, con: asyncpg.Connection):
         if self.history:
             return self.history
-        query = 'SELECT * FROM examinations WHERE patient_id = $1 ORDER BY date DESC;'
-        records = await con.fetch(query, self.id)
+        records = await queries.fetch(con, 'examinations.history', self.id)
         self.history = [Examination.build_from_record(record) for record in records]
         return self.history
 
     async def add_exam(self, summary: str, details: str, date: datetime.date = None, *, con: asyncpg.Connection):
-        if self.history is None:
-            await self.fetch_history(con=con)
+        """Insert an examination and return it. ``history`` is only updated if it has already been loaded."""
         date = date or datetime.date.today()
-        query = 'INSERT INTO examinations (patient_id, date, summary, details) VALUES ($1, $2, $3, $4) RETURNING *;'
-        record = await con.fetchrow(query, self.id, date, summary, details)
-        self.history.insert(0, Examination.build_from_record(record))
-        return self.history
+        record = await queries.fetchrow(con, 'examinations.insert', self.id, date, summary, details)
+        exam = Examination.build_from_record(record)
+        if self.history:
+            self.history.insert(0, exam)
+        return exam
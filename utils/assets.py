@@ -0,0 +1,116 @@
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Asset:
+    """One file held in memory, with a strong ETag and pre-built compressed variants.
+
+    A variant is only kept if it is actually smaller than the original. Every encoding gets its own ETag, since a
+    strong validator has to change whenever the bytes on the wire do.
+    """
+    __slots__ = ('content_type', 'mtime', 'etag', 'variants')
+
+    def __init__(self, body, content_type, mtime):
+        self.content_type = content_type
+        self.mtime = mtime
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {'identity': body}
+        compressed = gzip.compress(body, 9, mtime=0)
+        if len(compressed) < len(body):
+            self.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants['br'] = compressed
+
+    def negotiate(self, accept_encodings):
+        """Returns ``(encoding, body, etag)`` for the best variant the client accepts."""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding, self.variants[encoding], f'{self.etag}-{encoding}'
+        return 'identity', self.variants['identity'], self.etag
+
+
+class AssetCache:
+    """Small files (keys, static templates) served straight from memory.
+
+    Everything is loaded by :meth:`refresh`, which only re-reads files whose mtime changed, so it is cheap enough to
+    poll from a background task (see :meth:`start`). Templates are rendered once per change with ``render``, an
+    async callable taking the template source.
+    """
+    def __init__(self, max_age=86400):
+        self.max_age = max_age
+        self.assets = {}
+        self._sources = {}
+        self._directories = {}
+        self._timer = None
+
+    def add(self, name, path, content_type=None, render=None):
+        if content_type is None:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self._sources[name] = (path, content_type, render)
+
+    def add_directory(self, prefix, directory, content_type=None):
+        """Serve every file in ``directory`` as ``prefix/<filename>``, including ones that show up later."""
+        self._directories[prefix] = (directory, content_type)
+
+    def get(self, name):
+        return self.assets.get(name)
+
+    def _scan(self):
+        for prefix, (directory, content_type) in self._directories.items():
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_file() and f'{prefix}/{entry.name}' not in self._sources:
+                            self.add(f'{prefix}/{entry.name}', entry.path, content_type)
+            except FileNotFoundError:
+                pass
+
+    async def load(self, name):
+        path, content_type, render = self._sources[name]
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, 'rb') as f:
+            body = f.read()
+        if render is not None:
+            body = (await render(body.decode())).encode()
+        self.assets[name] = Asset(body, content_type, mtime)
+
+    async def refresh(self):
+        """(Re)load everything that is new or changed on disk, and drop anything that was deleted."""
+        self._scan()
+        for name, (path, _, _) in list(self._sources.items()):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                self.assets.pop(name, None)
+                continue
+            asset = self.assets.get(name)
+            if asset is None or asset.mtime != mtime:
+                try:
+                    await self.load(name)
+                except Exception:
+                    # keep serving the old copy, if any
+                    pass
+
+    async def _run(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh()
+
+    def start(self, interval):
+        """Check for changes on disk every ``interval`` seconds."""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._run(interval))
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
@@ -0,0 +1,124 @@
+from array import array
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NUMBER = b'0123456789.eE+-'
+WHITESPACE = b' \t\r\n'
+
+
+def _extend_json(values, part):
+    """Append a run of comma-separated JSON numbers (no brackets) to ``values``.
+
+    ``part`` always ends just before a ``,`` or the closing ``]``, so an empty one means an empty element: ``[1,]``
+    or ``[1,,2]``, however the body happened to be chunked.
+    """
+    if not part.strip():
+        raise ValueError('Empty element in JSON array.')
+    # also rules out true/false/null, strings, objects and nested arrays
+    if part.translate(None, NUMBER + WHITESPACE + b','):
+        raise ValueError('Data must be an array of JSON objects, or an array of floats.')
+    if orjson is not None:
+        values.extend(orjson.loads(b'[' + part + b']'))
+    else:
+        values.extend(map(float, part.split(b',')))
+
+
+async def read_json(chunks, loads):
+    """Decode a JSON body as it arrives.
+
+    An array of numbers is parsed chunk by chunk into an ``array('d')``, so neither the body nor a list of floats is
+    ever held in full. Anything else (grouped data, which is one object per class) is buffered and handed to
+    ``loads``.
+    """
+    chunks = chunks.__aiter__()
+    head = b''
+    async for chunk in chunks:
+        head += chunk
+        stripped = head.lstrip()
+        # read until the first character of the first element is known
+        if stripped and (stripped[:1] != b'[' or stripped[1:].lstrip()):
+            break
+    stripped = head.lstrip()
+    first = stripped[1:].lstrip()[:1]
+    if stripped[:1] != b'[' or not first or first not in b'-0123456789':
+        body = [head]
+        async for chunk in chunks:
+            body.append(chunk)
+        return loads(b''.join(body))
+
+    values = array('d')
+    pending = b''
+    closed = False
+
+    def feed(chunk):
+        nonlocal pending, closed
+        if closed:
+            if chunk.strip():
+                raise ValueError('Unexpected data after the JSON array.')
+            return
+        pending += chunk
+        if (close := pending.find(b']')) != -1:
+            if pending[close + 1:].strip():
+                raise ValueError('Unexpected data after the JSON array.')
+            _extend_json(values, pending[:close])
+            pending, closed = b'', True
+        elif (end := pending.rfind(b',')) != -1:
+            _extend_json(values, pending[:end])
+            pending = pending[end + 1:]
+
+    feed(stripped[1:])
+    async for chunk in chunks:
+        feed(chunk)
+    if not closed:
+        raise ValueError('Unterminated JSON array.')
+    return values
+
+
+async def read_csv(chunks, header=False):
+    """Numbers separated by commas and/or whitespace (so one-per-line works too), parsed as they arrive.
+
+    With ``header``, the first line is skipped.
+    """
+    values = array('d')
+    pending = b''
+    async for chunk in chunks:
+        pending += chunk
+        if header:
+            if (newline := pending.find(b'\n')) == -1:
+                continue
+            pending = pending[newline + 1:]
+            header = False
+        end = max(pending.rfind(separator) for separator in (b',', b'\n', b' ', b'\t'))
+        if end != -1:
+            _extend_csv(values, pending[:end])
+            pending = pending[end + 1:]
+    if not header:
+        _extend_csv(values, pending)
+    return values
+
+
+def _extend_csv(values, part):
+    if part.translate(None, NUMBER + WHITESPACE + b','):
+        raise ValueError('Data must be numbers separated by commas or newlines.')
+    values.extend(map(float, part.replace(b',', b' ').split()))
+
+
+async def read_float64(chunks):
+    """Raw little-endian float64s (``application/octet-stream``), copied straight into an ``array('d')``."""
+    values = array('d')
+    pending = b''
+    async for chunk in chunks:
+        if pending:
+            chunk = pending + chunk
+        usable = len(chunk) - len(chunk) % 8
+        values.frombytes(memoryview(chunk)[:usable])
+        pending = chunk[usable:]
+    if pending:
+        raise ValueError('Body length must be a multiple of 8 bytes.')
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+
+class RowError(ValueError):
+    pass
+
+
+def _field(js, key, kind, *, optional=False):
+    value = js.get(key)
+    if value is None:
+        if optional:
+            return None
+        raise RowError(f'{key} is required.')
+    # bool is an int as far as isinstance is concerned
+    if type(value) is bool or not isinstance(value, kind):
+        raise RowError(f'{key} must be {"an integer" if kind is int else "a string"}.')
+    return value
+
+
+def _date(js, key, *, optional=False):
+    if (value := _field(js, key, str, optional=optional)) is None:
+        return None
+    try:
+        return datetime.strptime(value, '%d %b %Y').date()
+    except ValueError:
+        raise RowError(f'{key} must look like "01 Jan 2021".') from None
+
+
+def _person(js):
+    age = _field(js, 'age', int)
+    if age < 0:
+        raise RowError('age must not be negative.')
+    return _field(js, 'name', str), age, _field(js, 'sex', str), _field(js, 'occupation', str, optional=True)
+
+
+def patient_row(js):
+    """Validate one patient, in the same shape as ``POST /patients``.
+
+    Returns ``(patient, next_of_kin)``: ``(name, age, sex, occupation, date_of_admission)`` and
+    ``(name, age, sex, occupation)``. Raises :class:`RowError` with a message meant for the client.
+    """
+    if type(js) is not dict:
+        raise RowError('Expected a JSON object.')
+    nok = js.get('next_of_kin')
+    if type(nok) is not dict:
+        raise RowError('next_of_kin must be a JSON object.')
+    try:
+        next_of_kin = _person(nok)
+    except RowError as e:
+        raise RowError(f'next_of_kin: {e}') from None
+    return (*_person(js), _date(js, 'doa')), next_of_kin
+
+
+def exam_row(js, today):
+    """Validate one examination, in the same shape as ``POST /patients/<id>``. Returns ``(date, summary, details)``."""
+    if type(js) is not dict:
+        raise RowError('Expected a JSON object.')
+    return _date(js, 'date', optional=True) or today, _field(js, 'summary', str), _field(js, 'details', str)
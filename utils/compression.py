@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+from quart.wrappers.response import DataBody, IterableBody
+import asyncio
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _Gzip:
+    def __init__(self):
+        self.obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.obj.compress(data)
+
+    def flush(self):
+        return self.obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self.obj = brotli.Compressor(quality=5)
+
+    def compress(self, data):
+        return self.obj.process(data)
+
+    def flush(self):
+        return self.obj.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self.obj = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self.obj.compress(data)
+
+    def flush(self):
+        return self.obj.flush()
+
+
+def _one_shot(encoder, data):
+    encoder = encoder()
+    return encoder.compress(data) + encoder.flush()
+
+
+class ResponseCompressor:
+    """Compresses text and JSON responses in whichever encoding the client prefers.
+
+    Bodies under ``min_size`` bytes go out as they are. Bodies of ``thread_threshold`` bytes or more are compressed on
+    a thread pool (zlib, brotli and zstandard all release the GIL), so a big ``/patients`` page doesn't stall every
+    other request. Streamed bodies are compressed chunk by chunk as they are sent.
+    """
+    mimetypes = ('application/json', 'application/x-ndjson', 'text/')
+
+    def __init__(self, min_size=1024, thread_threshold=256 * 1024, workers=2):
+        self.min_size = min_size
+        self.thread_threshold = thread_threshold
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='compress')
+        # preferred first, for when the client rates several equally
+        self.encoders = {}
+        if zstandard is not None:
+            self.encoders['zstd'] = _Zstd
+        if brotli is not None:
+            self.encoders['br'] = _Brotli
+        self.encoders['gzip'] = _Gzip
+
+    def negotiate(self, accept_encodings):
+        best, best_quality = None, 0
+        for encoding in self.encoders:
+            if (quality := accept_encodings[encoding]) > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    async def compress(self, response, accept_encodings):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        if not (response.mimetype or '').startswith(self.mimetypes):
+            return response
+        body = response.response
+        if isinstance(body, DataBody) and len(body.data) < self.min_size:
+            return response
+        if not isinstance(body, (DataBody, IterableBody)):
+            return response
+        response.vary.add('Accept-Encoding')
+        if (encoding := self.negotiate(accept_encodings)) is None:
+            return response
+        encoder = self.encoders[encoding]
+
+        if isinstance(body, DataBody):
+            if len(body.data) >= self.thread_threshold:
+                data = await asyncio.get_running_loop().run_in_executor(self.executor, _one_shot, encoder, body.data)
+            else:
+                data = _one_shot(encoder, body.data)
+            response.set_data(data)
+        else:
+            response.response = IterableBody(self._stream(body, encoder()))
+            response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        if (etag := response.headers.get('ETag')) is not None and not etag.startswith('W/'):
+            # same content, different bytes: only a weak validator still holds
+            response.headers['ETag'] = f'W/{etag}'
+        return response
+
+    @staticmethod
+    async def _stream(body, encoder):
+        async with body as chunks:
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                if data := encoder.compress(chunk):
+                    yield data
+        yield encoder.flush()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import random
+
+
+class Dataset:
+    """A small read-only JSON array, loaded once and served from pre-encoded bytes.
+
+    Items are kept as a tuple together with each one's encoded form, and ``indexes`` maps every value of
+    ``index_key`` to the positions holding it, so filtering and random picks never touch the items themselves.
+    """
+    def __init__(self, items, dumps, index_key=None):
+        self.items = tuple(items)
+        self.encoded = tuple(dumps(item).encode() for item in self.items)
+        self.indexes = {None: tuple(range(len(self.items)))}
+        if index_key is not None:
+            groups = {}
+            for position, item in enumerate(self.items):
+                groups.setdefault(item[index_key], []).append(position)
+            # None is already the index of everything
+            self.indexes.update((key, tuple(positions)) for key, positions in groups.items() if key is not None)
+        # unshuffled bodies for every index, built once
+        self.bodies = {key: self.render(positions) for key, positions in self.indexes.items()}
+        self.etags = {key: hashlib.sha1(body).hexdigest() for key, body in self.bodies.items()}
+
+    @classmethod
+    def load(cls, path, dumps, index_key=None):
+        with open(path) as f:
+            return cls(json.load(f), dumps, index_key)
+
+    def render(self, positions):
+        return b'[' + b','.join(self.encoded[position] for position in positions) + b']'
+
+    def select(self, key=None, *, limit=None, shuffle=False, seed=None):
+        """Returns ``(body, etag)``. The ETag is ``None`` when the order is random, since it can't be repeated."""
+        positions = self.indexes.get(key, ())
+        if not shuffle and limit is None:
+            return self.bodies.get(key, b'[]'), self.etags.get(key)
+        etag = None
+        if shuffle:
+            positions = list(positions)
+            random.Random(seed).shuffle(positions)
+        if limit is not None:
+            positions = positions[:max(limit, 0)]
+        body = self.render(positions)
+        if not shuffle or seed is not None:
+            etag = hashlib.sha1(body).hexdigest()
+        return body, etag
+
+    def random(self, key=None):
+        """Encoded form of a random item, or ``None`` if nothing matches."""
+        positions = self.indexes.get(key)
+        if not positions:
+            return None
+        return self.encoded[random.choice(positions)]
@@ -1,5 +1,3 @@
-from discord.utils import escape_markdown
-
 class plural:
     def __init__(self, value):
         self.value = value
@@ -79,5 +77,7 @@ def to_codeblock(content, language='py', replace_existing=True, escape_md=True,
     if replace_existing:
         content = content.replace('```', new)
     if escape_md:
+        # imported here so that the web app doesn't pull in discord.py
+        from discord.utils import escape_markdown
         content = escape_markdown(content)
     return f'```{language}\n{content}\n```'
\ No newline at end of file
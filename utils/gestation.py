@@ -0,0 +1,34 @@
+import datetime
+
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+# This is not Naegle's but is in keeping with 40 weeks of gestation.
+TERM_DAYS = 7 * 41
+
+
+def format_date(d):
+    """Same as ``d.strftime('%d %b %Y')`` in the C locale, without going through strftime."""
+    return f'{d.day:02d} {MONTHS[d.month - 1]} {d.year}'
+
+
+def gestation(lmp, today):
+    """EDD and gestation age (weeks.days) for a last menstrual period."""
+    edd = lmp + datetime.timedelta(days=TERM_DAYS)
+    # Probably missed something here
+    weeks, days = divmod((today - lmp).days, 7)
+    return {'lmp': format_date(lmp), 'edd': format_date(edd), 'gestation_age': weeks + days * 0.1}
+
+
+def gestation_many(lmps, today):
+    """:func:`gestation` for a list of dates. Batches repeat dates heavily, so each one is only formatted once."""
+    term = datetime.timedelta(days=TERM_DAYS)
+    names = {}
+    results = []
+    for lmp in lmps:
+        edd = lmp + term
+        if (lmp_name := names.get(lmp)) is None:
+            lmp_name = names[lmp] = format_date(lmp)
+        if (edd_name := names.get(edd)) is None:
+            edd_name = names[edd] = format_date(edd)
+        weeks, days = divmod((today - lmp).days, 7)
+        results.append({'lmp': lmp_name, 'edd': edd_name, 'gestation_age': weeks + days * 0.1})
+    return results
@@ -0,0 +1,46 @@
+from quart.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """JSON provider that uses orjson when it is installed and the stdlib otherwise.
+
+    Dates and dataclasses are still handed to :attr:`default` so responses look
+    the same whichever backend is in use.
+    """
+    if orjson is not None:
+        options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME \
+                  | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def _dump_bytes(self, obj, indent=False):
+        option = self.options | orjson.OPT_INDENT_2 if indent else self.options
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._dump_bytes(obj, indent=kwargs.get('indent') is not None).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._dump_bytes(obj, indent=indent)
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -1,39 +1,94 @@
+import asyncio
 import config
 import datetime
+import time
+
 
 class LastFMClient:
-    def __init__(self, session):
+    """Keeps the latest scrobble around and refreshes it without stampeding Last.fm.
+
+    Concurrent refreshes share one in-flight request, and a stale value is served straight away while the refresh
+    happens in the background. Failed refreshes back off exponentially, up to ``max_backoff`` seconds.
+    """
+    url = getattr(config, 'fm_api_url', 'https://ws.audioscrobbler.com/2.0/')
+
+    def __init__(self, session, *, max_age=60, max_backoff=900):
         self.session = session
+        self.max_age = max_age
+        self.max_backoff = max_backoff
+        # always replaced as a whole, never mutated, so readers never see a half-updated value
         self.cached = {'track': 'server starting', 'artist': 'beep boop', 'current': True}
         self.cached_date = None
-    async def update_cache(self):
-        self.cached_date = datetime.datetime.utcnow()
-        params={
+        self.failures = 0
+        self._fetched_at = None
+        self._retry_at = 0.0
+        self._refresh = None
+        self._timer = None
+
+    async def fetch(self):
+        params = {
             'method': 'user.getrecenttracks',
             'user': config.fm_username,
             'api_key': config.fm_api_key,
             'format': 'json',
             'limit': 1,
         }
-        async with self.session.get('https://ws.audioscrobbler.com/2.0/', params=params) as resp:
+        async with self.session.get(self.url, params=params) as resp:
             if resp.status != 200:
-                return
+                raise RuntimeError(f'Last.fm returned {resp.status}')
             js = await resp.json()
 
-        self.cached['track'] = js['recenttracks']['track'][0]['name']
-        self.cached['artist'] = js['recenttracks']['track'][0]['artist']['#text']
+        track = js['recenttracks']['track'][0]
+        info = {'track': track['name'], 'artist': track['artist']['#text'], 'current': False}
+        attrib = track.get('@attr')
+        if attrib is not None:
+            info['current'] = attrib['nowplaying'] == 'true'
+        return info
+
+    async def update_cache(self):
         try:
-            attrib = js['recenttracks']['track'][0].get('@attr')
-        except IndexError:
-            self.cached['current'] = False
-        else:
-            if attrib is not None:
-                self.cached['current'] = attrib['nowplaying'] == 'true'
-            else:
-                self.cached['current'] = False
+            info = await self.fetch()
+        except Exception:
+            self.failures += 1
+            self._retry_at = time.monotonic() + min(self.max_age * 2 ** (self.failures - 1), self.max_backoff)
+            return
+        self.failures = 0
+        self.cached = info
+        self.cached_date = datetime.datetime.utcnow()
+        self._fetched_at = time.monotonic()
+
+    def refresh(self):
+        """Start a refresh unless one is already running. Returns the in-flight task."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self.update_cache())
+        return self._refresh
+
+    @property
+    def stale(self):
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.max_age
 
     async def get_info(self):
-        if self.cached_date is None or datetime.datetime.utcnow() - self.cached_date > datetime.timedelta(seconds=60):
-            await self.update_cache()
+        if self.stale and time.monotonic() >= self._retry_at:
+            task = self.refresh()
+            if self._fetched_at is None:
+                # nothing worth serving yet
+                await asyncio.shield(task)
         return self.cached
 
+    async def _run(self, interval):
+        while True:
+            await self.refresh()
+            delay = interval
+            if self.failures:
+                delay = max(interval, self._retry_at - time.monotonic())
+            await asyncio.sleep(delay)
+
+    def start(self, interval=None):
+        """Refresh every ``interval`` seconds (``max_age`` by default) in the background."""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._run(interval or self.max_age))
+
+    def close(self):
+        for task in (self._timer, self._refresh):
+            if task is not None:
+                task.cancel()
@@ -0,0 +1,244 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import logging
+import os
+import posixpath
+import random
+import secrets
+
+log = logging.getLogger(__name__)
+
+
+class CacheWriter:
+    """Collects a file for :class:`MediaCache` as it streams past. Nothing is visible in the cache until ``commit``.
+
+    The file is opened, written and renamed on the cache's I/O thread. ``write`` only queues the chunk, so a slow disk
+    never holds up the stream it is copying.
+    """
+    def __init__(self, cache, name):
+        self.cache = cache
+        self.name = name
+        self.path = os.path.join(cache.directory, f'{name}.{secrets.token_hex(4)}.part')
+        self.size = 0
+        self.fp = None
+        self.error = None
+        self._submit(self._open)
+
+    def _submit(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.cache.io, func, *args)
+
+    def _open(self):
+        try:
+            self.fp = open(self.path, 'wb')
+        except OSError as e:
+            self.error = e
+
+    def _write(self, chunk):
+        if self.error is not None:
+            return
+        try:
+            self.fp.write(chunk)
+        except OSError as e:
+            self.error = e
+
+    def _close(self, final):
+        try:
+            if self.fp is not None:
+                self.fp.close()
+            if final is not None and self.error is None:
+                os.replace(self.path, final)
+                return
+        except OSError as e:
+            self.error = e
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        if self.error is not None:
+            raise self.error
+
+    def write(self, chunk):
+        self._submit(self._write, chunk)
+        self.size += len(chunk)
+
+    async def commit(self):
+        """Returns the path of the cached file. Raises ``OSError`` (having cleaned up) if it couldn't be written."""
+        final = os.path.join(self.cache.directory, self.name)
+        await self._submit(self._close, final)
+        self.cache._add(self.name, self.size)
+        return final
+
+    def abort(self):
+        """Queues the clean-up without waiting for it, so it's safe while being cancelled."""
+        self._submit(self._discard)
+
+    def _discard(self):
+        try:
+            self._close(None)
+        except OSError:
+            pass
+
+
+class MediaCache:
+    """On-disk LRU cache of upstream media, keyed on the upstream URL.
+
+    Files are named after the SHA-256 of their URL plus the original extension, so the extension can still be used to
+    guess the mimetype. ``pools`` optionally hold a few prefetched items per kind (``'cat'``, ``'dog'``) that can be
+    served without any upstream call at all.
+
+    All file system work happens on one I/O thread, in the order it was asked for, so none of it blocks the event
+    loop. Call :meth:`load` before use to pick up files from a previous run.
+    """
+    def __init__(self, session, directory, max_size=512 * 1024 * 1024, chunk_size=64 * 1024):
+        self.session = session
+        self.directory = directory
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.pools = {}
+        self._entries = OrderedDict()
+        self._rotating = set()
+        self._tasks = set()
+        self.io = ThreadPoolExecutor(1, thread_name_prefix='media-cache')
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.part'):
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        return found
+
+    async def load(self):
+        found = await asyncio.get_running_loop().run_in_executor(self.io, self._scan)
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self.size += size
+        self._evict()
+
+    def _add(self, name, size):
+        self.size += size - self._entries.get(name, 0)
+        self._entries[name] = size
+        self._entries.move_to_end(name)
+        self._evict()
+
+    def _evict(self):
+        loop = asyncio.get_running_loop()
+        while self.size > self.max_size and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.size -= size
+            loop.run_in_executor(self.io, self._remove, os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def key(url):
+        ext = posixpath.splitext(urlsplit(url).path)[1][:16]
+        return hashlib.sha256(url.encode()).hexdigest() + ext
+
+    def get(self, url):
+        """Returns the path of the cached file for ``url``, or ``None``."""
+        name = self.key(url)
+        if name not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(name)
+        self.hits += 1
+        return os.path.join(self.directory, name)
+
+    def writer(self, url):
+        return CacheWriter(self, self.key(url))
+
+    async def download(self, url):
+        """Makes sure ``url`` is in the cache. Returns its path, or ``None`` if upstream didn't have it."""
+        name = self.key(url)
+        if name in self._entries:
+            return os.path.join(self.directory, name)
+        async with self.session.get(url) as resp:
+            if resp.status != 200:
+                return None
+            writer = self.writer(url)
+            try:
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    writer.write(chunk)
+            except BaseException:
+                writer.abort()
+                raise
+        try:
+            return await writer.commit()
+        except OSError:
+            log.exception('Could not cache %s', url)
+            return None
+
+    async def fill_pool(self, kind, picker, size):
+        """Prefetch up to ``size`` random items for ``kind``. ``picker`` is a coroutine function returning a URL."""
+        pool = self.pools.setdefault(kind, [])
+        failures = 0
+        while len(pool) < size and failures < size:
+            url = await picker()
+            if url is None or url in pool or await self.download(url) is None:
+                failures += 1
+                continue
+            pool.append(url)
+
+    def from_pool(self, kind, picker):
+        """Pick a prefetched item for ``kind``. Returns its path, or ``None`` if there's nothing usable.
+
+        The served slot is replaced with a fresh item in the background so the pool doesn't go stale.
+        """
+        pool = self.pools.get(kind)
+        if not pool:
+            return None
+        index = random.randrange(len(pool))
+        path = self.get(pool[index])
+        if path is None:
+            # evicted from under us
+            pool.pop(index)
+        if kind not in self._rotating:
+            self._rotating.add(kind)
+            task = asyncio.create_task(self._rotate(kind, picker))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return path
+
+    async def _rotate(self, kind, picker):
+        try:
+            url = await picker()
+            if url is None or await self.download(url) is None:
+                return
+            pool = self.pools[kind]
+            if url in pool:
+                return
+            if pool:
+                pool[random.randrange(len(pool))] = url
+            else:
+                pool.append(url)
+        except Exception:
+            log.exception('Could not rotate the %s pool', kind)
+        finally:
+            self._rotating.discard(kind)
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        # queued writes still finish; anything half written is a .part file that load() removes next time
+        self.io.shutdown(wait=False)
+
+    @property
+    def stats(self):
+        return {'size': self.size, 'max_size': self.max_size, 'files': len(self._entries), 'hits': self.hits,
+                'misses': self.misses, 'pools': {kind: len(pool) for kind, pool in self.pools.items()}}
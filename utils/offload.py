@@ -0,0 +1,100 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import multiprocessing
+import signal
+import statistics
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from utils.stats import ArrayData, describe
+
+
+class Saturated(Exception):
+    pass
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class WorkerLost(Exception):
+    pass
+
+
+def _over_budget(signum, frame):
+    raise BudgetExceeded('Data took too long to process.')
+
+
+def _calc(what, buffer, interval, use_numpy, budget, bins):
+    """Runs in a worker. ``buffer`` holds the data as native float64s."""
+    if budget and hasattr(signal, 'setitimer'):
+        # ITIMER_PROF counts CPU time, so time spent queued or descheduled doesn't count against the request
+        signal.signal(signal.SIGPROF, _over_budget)
+        signal.setitimer(signal.ITIMER_PROF, budget)
+    try:
+        if use_numpy:
+            data = ArrayData(numpy.frombuffer(buffer, dtype=numpy.float64))
+            lookup = {'mean': data.mean, 'median': lambda: data.median_grouped(interval), 'mode': data.multimode,
+                      'describe': lambda: data.describe(interval, bins)}
+            return lookup[what]()
+        values = array('d')
+        values.frombytes(buffer)
+        values = values.tolist()
+        lookup = {
+            'mean': statistics.mean,
+            'median': lambda x: statistics.median_grouped(x, interval=interval),
+            'mode': statistics.multimode,
+            'describe': lambda x: describe(x, interval, bins),
+        }
+        return lookup[what](values)
+    finally:
+        if budget and hasattr(signal, 'setitimer'):
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+class StatsPool:
+    """Runs large /mean, /median and /mode jobs in worker processes so they don't hold up the event loop.
+
+    Data crosses the process boundary as one float64 buffer rather than a pickled list. Each job gets ``budget``
+    seconds of CPU time before it is abandoned with :class:`BudgetExceeded`, and once ``workers + queue_depth`` jobs
+    are in flight new ones are refused with :class:`Saturated` instead of queueing without bound. If a worker dies
+    (killed for running out of memory, say) the jobs in flight fail with :class:`WorkerLost` and the pool is replaced.
+    """
+    def __init__(self, workers=2, queue_depth=4, budget=5.0):
+        self.workers = workers
+        self.limit = workers + queue_depth
+        self.budget = budget
+        self.pending = 0
+        self.restarts = 0
+        self.executor = self._new_executor()
+
+    def _new_executor(self):
+        # workers are spawned rather than forked from a process with a running event loop and threads
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def run(self, what, buffer, interval=1.0, use_numpy=True, bins=10):
+        if self.pending >= self.limit:
+            raise Saturated('Too many large requests in progress, try again shortly.')
+        self.pending += 1
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            use_numpy = use_numpy and numpy is not None
+            return await loop.run_in_executor(executor, _calc, what, buffer, interval, use_numpy, self.budget, bins)
+        except BrokenProcessPool:
+            # every job in flight sees this; only the first replaces the pool
+            if executor is self.executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._new_executor()
+                self.restarts += 1
+            raise WorkerLost('A worker stopped unexpectedly, try again shortly.') from None
+        finally:
+            self.pending -= 1
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+
+import asyncpg
+
+CHANNEL = 'patient_changed'
+TRIGGERS = ('examinations_notify_patient', 'patients_notify_patient', 'relations_notify_patient')
+
+
+class PatientCache:
+    """Serialised ``GET /patients/<id>`` payloads, kept coherent across workers with LISTEN/NOTIFY.
+
+    The triggers from ``migrations/0003_patient_notify.sql`` NOTIFY a patient's id whenever their record, history or
+    next of kin changes. Every worker listens on a connection of its own and drops that entry. While the connection is
+    down, or until the triggers exist, nothing is cached, because a change could go unnoticed. Entries are evicted
+    least recently used first once more than ``max_size`` bytes are held.
+    """
+    def __init__(self, dsn, max_size=64 * 1024 * 1024, check_interval=30):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.listening = False
+        # bumped on every invalidation, so a payload read before one can't be stored after it
+        self.version = 0
+        self._entries = OrderedDict()
+        self._task = None
+
+    def get(self, patient_id):
+        """Returns ``(body, etag)`` or ``None``."""
+        entry = self._entries.get(patient_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(patient_id)
+        self.hits += 1
+        return entry
+
+    def put(self, patient_id, body, version):
+        """Cache ``body`` unless something was invalidated since ``version`` was read. Returns ``(body, etag)``."""
+        entry = body, hashlib.sha1(body).hexdigest()
+        if not self.listening or version != self.version or len(body) > self.max_size:
+            return entry
+        self.invalidate(patient_id, bump=False)
+        self._entries[patient_id] = entry
+        self.size += len(body)
+        while self.size > self.max_size:
+            _, (old, _) = self._entries.popitem(last=False)
+            self.size -= len(old)
+        return entry
+
+    def invalidate(self, patient_id, *, bump=True):
+        if bump:
+            self.version += 1
+        entry = self._entries.pop(patient_id, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+        self.size = 0
+
+    def _notified(self, con, pid, channel, payload):
+        try:
+            self.invalidate(int(payload))
+        except ValueError:
+            self.clear()
+
+    def _lost(self, con):
+        self.listening = False
+        self.clear()
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                con = await asyncpg.connect(self.dsn)
+            except Exception:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            delay = 1
+            lost = asyncio.Event()
+
+            def terminated(con):
+                self._lost(con)
+                lost.set()
+
+            try:
+                con.add_termination_listener(terminated)
+                await con.add_listener(CHANNEL, self._notified)
+                while True:
+                    if not self.listening:
+                        # without migration 0003 nothing is ever notified; checked again every interval
+                        if await con.fetchval('SELECT count(*) FROM pg_trigger WHERE tgname = any($1::text[]);',
+                                              TRIGGERS) == len(TRIGGERS):
+                            # anything cached before now may have missed a notification
+                            self.clear()
+                            self.listening = True
+                    try:
+                        await asyncio.wait_for(lost.wait(), self.check_interval)
+                        break
+                    except asyncio.TimeoutError:
+                        # a silently dropped connection would otherwise go unnoticed
+                        await asyncio.wait_for(con.fetchval('SELECT 1;'), self.check_interval)
+            except Exception:
+                pass
+            finally:
+                self._lost(con)
+                con.terminate()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    @property
+    def stats(self):
+        return {'size': self.size, 'max_size': self.max_size, 'entries': len(self._entries), 'hits': self.hits,
+                'misses': self.misses, 'listening': self.listening}
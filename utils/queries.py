@@ -0,0 +1,152 @@
+import re
+import time
+
+
+class QueryRegistry:
+    """Every static SQL statement the app runs, by name.
+
+    Statements registered with ``hot=True`` are run once, with every parameter NULL, as soon as a pool connection is
+    opened (pass :meth:`setup_connection` as the pool's ``init``). That puts them in asyncpg's per-connection
+    statement cache, so no request pays for the first parse. With NULL parameters every WHERE clause is false, so
+    this only makes sense for reads. Calls and time spent are counted per name in :attr:`stats`.
+    """
+    def __init__(self):
+        self.sql = {}
+        self.hot = set()
+        self.stats = {}
+        # off when there is no statement cache to warm (statement_cache_size = 0, e.g. behind pgbouncer)
+        self.warm = True
+
+    def add(self, name, sql, *, hot=False):
+        self.sql[name] = sql
+        self.stats[name] = [0, 0.0, 0.0]  # calls, total seconds, slowest call
+        if hot:
+            self.hot.add(name)
+        return name
+
+    async def setup_connection(self, con):
+        if not self.warm:
+            return
+        for name in self.hot:
+            sql = self.sql[name]
+            # statements from prepare() die when the connection goes back to the pool, so it's the cache or nothing
+            await con.fetch(sql, *[None] * max(map(int, re.findall(r'\$(\d+)', sql)), default=0))
+
+    def record(self, name, elapsed):
+        stats = self.stats[name]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    async def _run(self, con, method, name, args):
+        start = time.perf_counter()
+        try:
+            return await getattr(con, method)(self.sql[name], *args)
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    async def fetch(self, con, name, *args):
+        return await self._run(con, 'fetch', name, args)
+
+    async def fetchrow(self, con, name, *args):
+        return await self._run(con, 'fetchrow', name, args)
+
+    async def fetchval(self, con, name, *args):
+        return await self._run(con, 'fetchval', name, args)
+
+    async def execute(self, con, name, *args):
+        return await self._run(con, 'execute', name, args)
+
+    async def pages(self, con, name, *args, size):
+        """Run ``name`` through a server-side cursor, yielding up to ``size`` records at a time. The caller holds the
+        transaction. Counts as one call, timed only while waiting on the database.
+        """
+        elapsed = 0.0
+        try:
+            start = time.perf_counter()
+            cursor = await con.cursor(self.sql[name], *args)
+            records = await cursor.fetch(size)
+            elapsed += time.perf_counter() - start
+            while records:
+                yield records
+                start = time.perf_counter()
+                records = await cursor.fetch(size)
+                elapsed += time.perf_counter() - start
+        finally:
+            self.record(name, elapsed)
+
+    def summary(self):
+        return {name: {'calls': calls, 'total_ms': total * 1000, 'mean_ms': total * 1000 / calls if calls else 0.0,
+                       'max_ms': slowest * 1000}
+                for name, (calls, total, slowest) in self.stats.items()}
+
+
+queries = QueryRegistry()
+
+# utils/tokens.py
+queries.add('tokens.existing', 'SELECT app_name, secret FROM api_tokens WHERE user_id = $1 AND app_id = $2;')
+queries.add('tokens.new', 'INSERT INTO api_tokens (user_id, app_name, secret) VALUES ($1, $2, $3) RETURNING app_id;')
+queries.add('tokens.secret', 'SELECT secret FROM api_tokens WHERE user_id = $1 AND app_id = $2;', hot=True)
+queries.add('tokens.delete_user', 'DELETE FROM api_tokens WHERE user_id = $1;')
+queries.add('tokens.delete_app', 'DELETE FROM api_tokens WHERE user_id = $1 AND app_id = $2 RETURNING app_name;')
+
+# models/hosp.py
+queries.add('patients.fetch', """SELECT p.*,
+                                        r.id AS nok_id, r.name AS nok_name, r.age AS nok_age, r.sex AS nok_sex,
+                                        r.occupation AS nok_occupation,
+                                        h.*
+                                 FROM patients p
+                                 LEFT JOIN relations r ON r.id = p.next_of_kin_id,
+                                 LATERAL (
+                                     SELECT array_agg(e.id ORDER BY e.date DESC, e.id DESC) AS exam_ids,
+                                            array_agg(e.date ORDER BY e.date DESC, e.id DESC) AS exam_dates,
+                                            array_agg(e.summary ORDER BY e.date DESC, e.id DESC) AS exam_summaries,
+                                            array_agg(e.details ORDER BY e.date DESC, e.id DESC) AS exam_details
+                                     FROM examinations e
+                                     WHERE e.patient_id = p.id
+                                 ) h
+                                 WHERE p.id = $1;
+                              """, hot=True)
+queries.add('patients.get', """SELECT p.*,
+                                      r.id AS nok_id, r.name AS nok_name, r.age AS nok_age, r.sex AS nok_sex,
+                                      r.occupation AS nok_occupation
+                               FROM patients p
+                               LEFT JOIN relations r ON r.id = p.next_of_kin_id
+                               WHERE p.id = $1;
+                            """, hot=True)
+# history pages: details is only read (and detoasted) when $3 is true; a NULL limit means no limit
+queries.add('examinations.page', 'SELECT id, patient_id, date, summary, CASE WHEN $3 THEN details END AS details '
+                                 'FROM examinations WHERE patient_id = $1 AND id > $2 '
+                                 'ORDER BY date DESC, id DESC LIMIT $4;')
+queries.add('examinations.page_before', 'SELECT id, patient_id, date, summary, '
+                                        'CASE WHEN $3 THEN details END AS details '
+                                        'FROM examinations WHERE patient_id = $1 AND id > $2 AND (date, id) < ($5, $6) '
+                                        'ORDER BY date DESC, id DESC LIMIT $4;')
+# undated examinations sort first (DESC puts NULLs first), so after an undated one come the rest of the undated ones
+# and then everything dated; the row comparison above would drop both
+queries.add('examinations.page_before_undated', 'SELECT id, patient_id, date, summary, '
+                                                'CASE WHEN $3 THEN details END AS details '
+                                                'FROM examinations WHERE patient_id = $1 AND id > $2 '
+                                                'AND (date IS NOT NULL OR id < $5) '
+                                                'ORDER BY date DESC, id DESC LIMIT $4;')
+queries.add('relations.get', 'SELECT * FROM relations WHERE id = $1;')
+queries.add('examinations.history', 'SELECT * FROM examinations WHERE patient_id = $1 ORDER BY date DESC, id DESC;')
+queries.add('examinations.insert', 'INSERT INTO examinations (patient_id, date, summary, details) VALUES ($1, $2, $3, $4) '
+                                   'RETURNING *;')
+# a NULL leaves that column as it was
+queries.add('examinations.amend', 'UPDATE examinations SET summary = COALESCE($2, summary), '
+                                  'details = COALESCE($3, details) WHERE id = $1 RETURNING *;')
+
+# app.py
+queries.add('patients.page', 'SELECT id, name, age, sex, occupation FROM patients WHERE id > $1 ORDER BY id LIMIT $2;',
+            hot=True)
+queries.add('patients.all', 'SELECT id, name, age, sex, occupation FROM patients WHERE id > $1 ORDER BY id;')
+queries.add('patients.insert', 'INSERT INTO patients (name, age, sex, occupation, date_of_admission, next_of_kin_id) '
+                               'VALUES ($1, $2, $3, $4, $5, $6) RETURNING *;')
+queries.add('relations.insert', 'INSERT INTO relations (name, age, sex, occupation) VALUES ($1, $2, $3, $4) '
+                                'RETURNING *;')
+queries.add('examinations.get', 'SELECT * FROM examinations WHERE id = $1;', hot=True)
+queries.add('patients.exists', 'SELECT EXISTS (SELECT 1 FROM patients WHERE id = $1);')
+# ids for rows loaded with COPY, which can't return them
+queries.add('ids.reserve', "SELECT nextval(pg_get_serial_sequence($1, 'id')) FROM generate_series(1, $2);")
@@ -0,0 +1,294 @@
+from bisect import bisect_left, bisect_right
+from fractions import Fraction
+import math
+import statistics
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _summary(ordered, n, mean, variance, median, modes, bins, searchsorted):
+    """The parts of a description that only need the sorted data. ``searchsorted`` maps a list of values to their
+    left insertion points in ``ordered``.
+    """
+    lo, hi = float(ordered[0]), float(ordered[n - 1])
+    quartiles = None
+    if n > 1:
+        # statistics.quantiles(method='inclusive')
+        quartiles = []
+        for i in range(1, 4):
+            j, delta = divmod(i * (n - 1), 4)
+            quartiles.append((float(ordered[j]) * (4 - delta) + float(ordered[j + 1]) * delta) / 4)
+    if lo == hi:
+        histogram = [{'lower': lo, 'upper': hi, 'count': n}]
+    else:
+        # equal-width bins, each including its lower edge; the last one also includes the maximum
+        edges = [lo + (hi - lo) * i / bins for i in range(bins)] + [hi]
+        cuts = [0, *searchsorted(edges[1:-1]), n]
+        histogram = [{'lower': edges[i], 'upper': edges[i + 1], 'count': cuts[i + 1] - cuts[i]} for i in range(bins)]
+    return {
+        'count': n,
+        'mean': mean,
+        'variance': variance,
+        'stdev': math.sqrt(variance) if variance is not None else None,
+        'min': lo,
+        'max': hi,
+        'quartiles': quartiles,
+        'median': median,
+        'mode': modes,
+        'histogram': histogram,
+    }
+
+
+def describe(data, interval=1.0, bins=10):
+    """Summary statistics for a list of floats.
+
+    Mean and variance (sample variance, as :func:`statistics.variance`) come from Welford's update in the same loop
+    that counts values for the mode, so they can differ from ``/mean`` in the last bits. Everything else is read off
+    one sorted copy: quartiles as :func:`statistics.quantiles` with ``method='inclusive'``, and ``median`` as
+    :func:`statistics.median_grouped`, like ``/median``.
+    """
+    n = 0
+    mean = m2 = 0.0
+    counts = {}
+    for x in data:
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+        counts[x] = counts.get(x, 0) + 1
+    if not n:
+        raise statistics.StatisticsError('describe requires at least one data point')
+    ordered = sorted(data)
+    x = ordered[n // 2]
+    i, j = bisect_left(ordered, x), bisect_right(ordered, x)
+    interval = float(interval)
+    median = float(x) - interval / 2.0 + interval * (n / 2 - i) / (j - i)
+    maxcount = max(counts.values())
+    modes = [value for value, count in counts.items() if count == maxcount]
+    return _summary(ordered, n, mean, m2 / (n - 1) if n > 1 else None, median, modes, bins,
+                    lambda edges: [bisect_left(ordered, edge) for edge in edges])
+
+
+class GroupedData:
+    """Class-interval data held as (mid, frequency) pairs.
+
+    Gives the same answers as running :mod:`statistics` over the expanded
+    list ``[mid] * frequency`` for every class, without ever building it.
+    """
+    def __init__(self, pairs=(), interval=1.0):
+        self.interval = interval
+        self.pairs = []
+        self.n = 0
+        for mid, frequency in pairs:
+            self.add(mid, frequency)
+
+    def add(self, mid, frequency):
+        if type(frequency) is not int:
+            raise TypeError(f'frequency must be an integer, not {type(frequency).__name__}')
+        if frequency > 0:
+            self.pairs.append((mid, frequency))
+            self.n += frequency
+
+    def mean(self):
+        if self.n < 1:
+            raise statistics.StatisticsError('mean requires at least one data point')
+        T = int
+        total = Fraction(0)
+        special = None
+        for mid, frequency in self.pairs:
+            if type(mid) is float:
+                T = float
+                if not math.isfinite(mid):
+                    special = mid * frequency if special is None else special + mid * frequency
+                    continue
+            total += Fraction(mid) * frequency
+        if special is not None:
+            return special / self.n
+        value = total / self.n
+        if T is int and value.denominator != 1:
+            T = float
+        return T(value)
+
+    def median_grouped(self):
+        if not self.n:
+            raise statistics.StatisticsError('no median for empty data')
+        # Classes sorted by mid; equal mids are one class as far as the median is concerned.
+        ordered = sorted(self.pairs, key=lambda p: p[0])
+        half = self.n // 2
+        seen = 0
+        for mid, frequency in ordered:
+            seen += frequency
+            if seen > half:
+                x = mid
+                break
+        cf = f = 0
+        for mid, frequency in ordered:
+            if mid < x:
+                cf += frequency
+            elif mid == x:
+                f += frequency
+        interval = float(self.interval)
+        L = float(x) - interval / 2.0
+        return L + interval * (self.n / 2 - cf) / f
+
+    def multimode(self):
+        counts = {}
+        for mid, frequency in self.pairs:
+            counts[mid] = counts.get(mid, 0) + frequency
+        if not counts:
+            return []
+        maxcount = max(counts.values())
+        return [value for value, count in counts.items() if count == maxcount]
+
+    def _classes(self):
+        """``(mid, frequency)`` sorted by mid, with classes sharing a mid merged."""
+        classes = {}
+        for mid, frequency in sorted(self.pairs, key=lambda p: p[0]):
+            classes[mid] = classes.get(mid, 0) + frequency
+        return list(classes.items())
+
+    def mode(self):
+        """The grouped mode, ``L + (f1 - f0) / (2 * f1 - f0 - f2) * interval``, where ``L`` and ``f1`` are the lower
+        bound and frequency of the modal class (the first, if several tie) and ``f0`` and ``f2`` are the frequencies
+        of the classes either side of it. Empty classes aren't kept, so a neighbour that isn't one interval away, or
+        past either end, counts as 0.
+        """
+        ordered = self._classes()
+        if not ordered:
+            raise statistics.StatisticsError('no mode for empty data')
+        interval = float(self.interval)
+        i = max(range(len(ordered)), key=lambda i: ordered[i][1])
+        mid, f1 = ordered[i]
+
+        def neighbour(j):
+            if 0 <= j < len(ordered) and abs(ordered[j][0] - mid) < 1.5 * interval:
+                return ordered[j][1]
+            return 0
+
+        f0, f2 = neighbour(i - 1), neighbour(i + 1)
+        return (f1 - f0) / (2 * f1 - f0 - f2) * interval + (float(mid) - interval / 2.0)
+
+    def _quantile(self, ordered, k):
+        """The ``k``th quartile, interpolated within its class the same way as :meth:`median_grouped` (``k=2``)."""
+        target = k * self.n // 4
+        seen = 0
+        for mid, frequency in ordered:
+            seen += frequency
+            if seen > target:
+                x = mid
+                break
+        cf = sum(frequency for mid, frequency in ordered if mid < x)
+        f = sum(frequency for mid, frequency in ordered if mid == x)
+        interval = float(self.interval)
+        return float(x) - interval / 2.0 + interval * (k * self.n / 4 - cf) / f
+
+    def describe(self):
+        """Summary statistics, treating each class as ``frequency`` points at its mid.
+
+        Mean and variance use the weighted form of Welford's update. ``min``/``max`` are the outer class bounds, the
+        quartiles are interpolated within classes like the median, ``mode`` is :meth:`mode` (a single number, as from
+        ``/mode``, rather than a list) and the histogram is the classes themselves.
+        """
+        if not self.n:
+            raise statistics.StatisticsError('describe requires at least one data point')
+        n = 0
+        mean = m2 = 0.0
+        for mid, frequency in self.pairs:
+            n += frequency
+            delta = mid - mean
+            mean += delta * frequency / n
+            m2 += frequency * delta * (mid - mean)
+        ordered = self._classes()
+        half = float(self.interval) / 2.0
+        variance = m2 / (n - 1) if n > 1 else None
+        return {
+            'count': n,
+            'mean': mean,
+            'variance': variance,
+            'stdev': math.sqrt(variance) if variance is not None else None,
+            'min': float(ordered[0][0]) - half,
+            'max': float(ordered[-1][0]) + half,
+            'quartiles': [self._quantile(ordered, k) for k in range(1, 4)],
+            'median': self.median_grouped(),
+            'mode': self.mode(),
+            'histogram': [{'lower': float(mid) - half, 'upper': float(mid) + half, 'count': frequency}
+                          for mid, frequency in ordered],
+        }
+
+
+class ArrayData:
+    """Raw numeric data held in a float64 NumPy array.
+
+    Validation, conversion and reduction all happen as bulk array operations.
+    ``median_grouped`` and ``multimode`` give exactly the same answers as
+    :mod:`statistics` on ``[float(x) for x in data]``. ``mean`` uses NumPy's
+    pairwise summation rather than an exact fractional sum, so it agrees with
+    :func:`statistics.mean` to within roughly ``log2(n) * eps * mean(|x|)``
+    (well under 1e-12 relative for n up to 10^7 on same-signed data).
+    """
+    def __init__(self, values):
+        self.values = values
+
+    @classmethod
+    def from_list(cls, data):
+        """Returns ``None`` if NumPy is unavailable or data isn't a flat array of ints and floats."""
+        if numpy is None:
+            return None
+        # NumPy would quietly turn true/false into 1/0 alongside numbers
+        if any(type(x) is bool for x in data):
+            return None
+        try:
+            values = numpy.array(data)
+        except (ValueError, TypeError, OverflowError):
+            return None
+        if values.ndim != 1 or values.dtype.kind not in 'iuf':
+            return None
+        return cls(values.astype(numpy.float64, copy=False))
+
+    @classmethod
+    def from_buffer(cls, values):
+        """Wraps an ``array('d')`` (or any float64 buffer) without copying. Returns ``None`` if NumPy is unavailable."""
+        if numpy is None:
+            return None
+        return cls(numpy.frombuffer(values, dtype=numpy.float64))
+
+    def mean(self):
+        if not self.values.size:
+            raise statistics.StatisticsError('mean requires at least one data point')
+        return float(self.values.mean())
+
+    def median_grouped(self, interval=1.0):
+        n = self.values.size
+        if not n:
+            raise statistics.StatisticsError('no median for empty data')
+        data = numpy.sort(self.values)
+        x = data[n // 2]
+        i = int(numpy.searchsorted(data, x, side='left'))
+        j = int(numpy.searchsorted(data, x, side='right'))
+        interval = float(interval)
+        L = float(x) - interval / 2.0
+        return L + interval * (n / 2 - i) / (j - i)
+
+    def multimode(self):
+        if not self.values.size:
+            return []
+        uniques, first_seen, counts = numpy.unique(self.values, return_index=True, return_counts=True)
+        modal = counts == counts.max()
+        # statistics.multimode lists modes in order of first appearance
+        order = numpy.argsort(first_seen[modal], kind='stable')
+        return uniques[modal][order].tolist()
+
+    def describe(self, interval=1.0, bins=10):
+        """Same fields as :func:`describe`. Variance is NumPy's two-pass ``var(ddof=1)`` rather than Welford's, which
+        would mean a Python-level loop.
+        """
+        n = self.values.size
+        if not n:
+            raise statistics.StatisticsError('describe requires at least one data point')
+        ordered = numpy.sort(self.values)
+        variance = float(self.values.var(ddof=1)) if n > 1 else None
+        return _summary(ordered, n, self.mean(), variance, self.median_grouped(interval), self.multimode(), bins,
+                        lambda edges: numpy.searchsorted(ordered, edges).tolist())
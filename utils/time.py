@@ -1,8 +1,8 @@
+from collections import OrderedDict
 import datetime
 import parsedatetime as pdt
 from dateutil.relativedelta import relativedelta
 from .formats import plural, human_join
-from discord.ext import commands
 import re
 
 # Monkey patch mins and secs into the units
@@ -10,6 +10,16 @@ units = pdt.pdtLocales['en_US'].units
 units['minutes'].append('mins')
 units['seconds'].append('secs')
 
+class BadArgument(ValueError):
+    """The argument couldn't be parsed as a time."""
+
+def __getattr__(name):
+    # The discord.py converters live in utils.time_converters so the web app never imports discord.py.
+    if name == 'UserFriendlyTime':
+        from .time_converters import UserFriendlyTime
+        return UserFriendlyTime
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 class ShortTime:
     compiled = re.compile("""(?:(?P<years>[0-9])(?:years?|y))?             # e.g. 2y
                              (?:(?P<months>[0-9]{1,2})(?:months?|mo))?     # e.g. 2months
@@ -23,16 +33,12 @@ class ShortTime:
     def __init__(self, argument, *, now=None):
         match = self.compiled.fullmatch(argument)
         if match is None or not match.group(0):
-            raise commands.BadArgument('invalid time provided')
+            raise BadArgument('invalid time provided')
 
         data = { k: int(v) for k, v in match.groupdict(default=0).items() }
         now = now or datetime.datetime.utcnow()
         self.dt = now + relativedelta(**data)
 
-    @classmethod
-    async def convert(cls, ctx, argument):
-        return cls(argument, now=ctx.message.created_at)
-
 class HumanTime:
     calendar = pdt.Calendar(version=pdt.VERSION_CONTEXT_STYLE)
 
@@ -40,7 +46,7 @@ class HumanTime:
         now = now or datetime.datetime.utcnow()
         dt, status = self.calendar.parseDT(argument, sourceTime=now)
         if not status.hasDateOrTime:
-            raise commands.BadArgument('invalid time provided, try e.g. "tomorrow" or "3 days"')
+            raise BadArgument('invalid time provided, try e.g. "tomorrow" or "3 days"')
 
         if not status.hasTime:
             # replace it with the current time
@@ -49,10 +55,6 @@ class HumanTime:
         self.dt = dt
         self._past = dt < now
 
-    @classmethod
-    async def convert(cls, ctx, argument):
-        return cls(argument, now=ctx.message.created_at)
-
 class Time(HumanTime):
     def __init__(self, argument, *, now=None):
         try:
@@ -68,119 +70,75 @@ class FutureTime(Time):
         super().__init__(argument, now=now)
 
         if self._past:
-            raise commands.BadArgument('this time is in the past')
-
-class UserFriendlyTime(commands.Converter):
-    """That way quotes aren't absolutely necessary."""
-    def __init__(self, converter=None, *, default=None):
-        if isinstance(converter, type) and issubclass(converter, commands.Converter):
-            converter = converter()
-
-        if converter is not None and not isinstance(converter, commands.Converter):
-            raise TypeError('commands.Converter subclass necessary.')
-
-        self.converter = converter
-        self.default = default
-
-    async def check_constraints(self, ctx, now, remaining):
-        if self.dt < now:
-            raise commands.BadArgument('This time is in the past.')
-
-        if not remaining:
-            if self.default is None:
-                raise commands.BadArgument('Missing argument after the time.')
-            remaining = self.default
-
-        if self.converter is not None:
-            self.arg = await self.converter.convert(ctx, remaining)
+            raise BadArgument('this time is in the past')
+
+class DateParser:
+    """Parses calendar dates, trying the cheap options first.
+
+    1. Strict ``2026-03-01`` and ``01 Mar 2026`` (or ``1 March 2026``) formats.
+    2. A bounded LRU memo of earlier natural-language parses, keyed on (argument, today).
+    3. :class:`Time`, i.e. ``ShortTime`` and then parsedatetime.
+
+    :meth:`parse` returns ``(date, past)``. parsedatetime moves dates without a year into the future, so a natural
+    language result exactly one year ahead is brought back to this year, as the ``/gestation`` endpoint always has.
+    """
+    iso = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+    day_month_year = re.compile(r'(\d{1,2}) ([A-Za-z]{3,9})\.? (\d{4})')
+    months = {name.lower(): i for i, name in enumerate(
+        ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November',
+         'December'), start=1)}
+    months.update({name[:3]: i for name, i in list(months.items())})
+    months['sept'] = 9
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.stats = {'fast': 0, 'memo': 0, 'natural': 0}
+        self._memo = OrderedDict()
+
+    def parse_strict(self, argument):
+        """Returns a date for the strict formats, or ``None`` if the argument isn't in one of them."""
+        if (match := self.iso.fullmatch(argument)) is not None:
+            year, month, day = map(int, match.groups())
+        elif (match := self.day_month_year.fullmatch(argument)) is not None:
+            day, year = int(match[1]), int(match[3])
+            if (month := self.months.get(match[2].lower())) is None:
+                return None
         else:
-            self.arg = remaining
-        return self
-
-    def copy(self):
-        cls = self.__class__
-        obj = cls.__new__(cls)
-        obj.converter = self.converter
-        obj.default = self.default
-        return obj
-
-    async def convert(self, ctx, argument):
-        # Create a copy of ourselves to prevent race conditions from two
-        # events modifying the same instance of a converter
-        result = self.copy()
+            return None
         try:
-            calendar = HumanTime.calendar
-            regex = ShortTime.compiled
-            now = ctx.message.created_at
-
-            match = regex.match(argument)
-            if match is not None and match.group(0):
-                data = { k: int(v) for k, v in match.groupdict(default=0).items() }
-                remaining = argument[match.end():].strip()
-                result.dt = now + relativedelta(**data)
-                return await result.check_constraints(ctx, now, remaining)
-
-
-            # apparently nlp does not like "from now"
-            # it likes "from x" in other cases though so let me handle the 'now' case
-            if argument.endswith('from now'):
-                argument = argument[:-8].strip()
-
-            if argument[0:2] == 'me':
-                # starts with "me to", "me in", or "me at "
-                if argument[0:6] in ('me to ', 'me in ', 'me at '):
-                    argument = argument[6:]
-
-            elements = calendar.nlp(argument, sourceTime=now)
-            if elements is None or len(elements) == 0:
-                raise commands.BadArgument('Invalid time provided, try e.g. "tomorrow" or "3 days".')
-
-            # handle the following cases:
-            # "date time" foo
-            # date time foo
-            # foo date time
-
-            # first the first two cases:
-            dt, status, begin, end, dt_string = elements[0]
-
-            if not status.hasDateOrTime:
-                raise commands.BadArgument('Invalid time provided, try e.g. "tomorrow" or "3 days".')
-
-            if begin not in (0, 1) and end != len(argument):
-                raise commands.BadArgument('Time is either in an inappropriate location, which ' \
-                                           'must be either at the end or beginning of your input, ' \
-                                           'or I just flat out did not understand what you meant. Sorry.')
-
-            if not status.hasTime:
-                # replace it with the current time
-                dt = dt.replace(hour=now.hour, minute=now.minute, second=now.second, microsecond=now.microsecond)
-
-            # if midnight is provided, just default to next day
-            if status.accuracy == pdt.pdtContext.ACU_HALFDAY:
-                dt = dt.replace(day=now.day + 1)
-
-            result.dt =  dt
-
-            if begin in (0, 1):
-                if begin == 1:
-                    # check if it's quoted:
-                    if argument[0] != '"':
-                        raise commands.BadArgument('Expected quote before time input...')
-
-                    if not (end < len(argument) and argument[end] == '"'):
-                        raise commands.BadArgument('If the time is quoted, you must unquote it.')
-
-                    remaining = argument[end + 1:].lstrip(' ,.!')
-                else:
-                    remaining = argument[end:].lstrip(' ,.!')
-            elif len(argument) == end:
-                remaining = argument[:begin].strip()
-
-            return await result.check_constraints(ctx, now, remaining)
-        except:
-            import traceback
-            traceback.print_exc()
-            raise
+            return datetime.date(year, month, day)
+        except ValueError as e:
+            raise BadArgument(str(e)) from None
+
+    def parse(self, argument, today=None):
+        today = today or datetime.date.today()
+        argument = argument.strip()
+        if (parsed := self.parse_strict(argument)) is not None:
+            self.stats['fast'] += 1
+            return parsed, parsed <= today
+
+        key = (argument, today)
+        if (cached := self._memo.get(key)) is not None:
+            self._memo.move_to_end(key)
+            self.stats['memo'] += 1
+        else:
+            self.stats['natural'] += 1
+            try:
+                time = Time(argument)
+            except BadArgument as e:
+                # junk is remembered too, so repeating it doesn't cost a parsedatetime run each time
+                cached = e
+            else:
+                parsed, past = time.dt.date(), time._past
+                if not past and parsed.year - today.year == 1:
+                    parsed, past = parsed.replace(year=today.year), True
+                cached = (parsed, past)
+            self._memo[key] = cached
+            if len(self._memo) > self.maxsize:
+                self._memo.popitem(last=False)
+        if isinstance(cached, BadArgument):
+            raise BadArgument(str(cached))
+        return cached
 
 def human_timedelta(dt, *, source=None, accuracy=3, brief=False, suffix=True):
     now = source or datetime.datetime.utcnow()
@@ -0,0 +1,141 @@
+"""discord.py converters for the parsers in :mod:`utils.time`.
+
+Importing this module imports discord.py, so the web app should stick to :mod:`utils.time`.
+"""
+from dateutil.relativedelta import relativedelta
+from discord.ext import commands
+import parsedatetime as pdt
+
+from . import time
+
+class _Converter:
+    @classmethod
+    async def convert(cls, ctx, argument):
+        try:
+            return cls(argument, now=ctx.message.created_at)
+        except time.BadArgument as e:
+            raise commands.BadArgument(str(e)) from None
+
+class ShortTime(_Converter, time.ShortTime):
+    pass
+
+class HumanTime(_Converter, time.HumanTime):
+    pass
+
+class Time(_Converter, time.Time):
+    pass
+
+class FutureTime(_Converter, time.FutureTime):
+    pass
+
+class UserFriendlyTime(commands.Converter):
+    """That way quotes aren't absolutely necessary."""
+    def __init__(self, converter=None, *, default=None):
+        if isinstance(converter, type) and issubclass(converter, commands.Converter):
+            converter = converter()
+
+        if converter is not None and not isinstance(converter, commands.Converter):
+            raise TypeError('commands.Converter subclass necessary.')
+
+        self.converter = converter
+        self.default = default
+
+    async def check_constraints(self, ctx, now, remaining):
+        if self.dt < now:
+            raise commands.BadArgument('This time is in the past.')
+
+        if not remaining:
+            if self.default is None:
+                raise commands.BadArgument('Missing argument after the time.')
+            remaining = self.default
+
+        if self.converter is not None:
+            self.arg = await self.converter.convert(ctx, remaining)
+        else:
+            self.arg = remaining
+        return self
+
+    def copy(self):
+        cls = self.__class__
+        obj = cls.__new__(cls)
+        obj.converter = self.converter
+        obj.default = self.default
+        return obj
+
+    async def convert(self, ctx, argument):
+        # Create a copy of ourselves to prevent race conditions from two
+        # events modifying the same instance of a converter
+        result = self.copy()
+        try:
+            calendar = time.HumanTime.calendar
+            regex = time.ShortTime.compiled
+            now = ctx.message.created_at
+
+            match = regex.match(argument)
+            if match is not None and match.group(0):
+                data = { k: int(v) for k, v in match.groupdict(default=0).items() }
+                remaining = argument[match.end():].strip()
+                result.dt = now + relativedelta(**data)
+                return await result.check_constraints(ctx, now, remaining)
+
+
+            # apparently nlp does not like "from now"
+            # it likes "from x" in other cases though so let me handle the 'now' case
+            if argument.endswith('from now'):
+                argument = argument[:-8].strip()
+
+            if argument[0:2] == 'me':
+                # starts with "me to", "me in", or "me at "
+                if argument[0:6] in ('me to ', 'me in ', 'me at '):
+                    argument = argument[6:]
+
+            elements = calendar.nlp(argument, sourceTime=now)
+            if elements is None or len(elements) == 0:
+                raise commands.BadArgument('Invalid time provided, try e.g. "tomorrow" or "3 days".')
+
+            # handle the following cases:
+            # "date time" foo
+            # date time foo
+            # foo date time
+
+            # first the first two cases:
+            dt, status, begin, end, dt_string = elements[0]
+
+            if not status.hasDateOrTime:
+                raise commands.BadArgument('Invalid time provided, try e.g. "tomorrow" or "3 days".')
+
+            if begin not in (0, 1) and end != len(argument):
+                raise commands.BadArgument('Time is either in an inappropriate location, which ' \
+                                           'must be either at the end or beginning of your input, ' \
+                                           'or I just flat out did not understand what you meant. Sorry.')
+
+            if not status.hasTime:
+                # replace it with the current time
+                dt = dt.replace(hour=now.hour, minute=now.minute, second=now.second, microsecond=now.microsecond)
+
+            # if midnight is provided, just default to next day
+            if status.accuracy == pdt.pdtContext.ACU_HALFDAY:
+                dt = dt.replace(day=now.day + 1)
+
+            result.dt =  dt
+
+            if begin in (0, 1):
+                if begin == 1:
+                    # check if it's quoted:
+                    if argument[0] != '"':
+                        raise commands.BadArgument('Expected quote before time input...')
+
+                    if not (end < len(argument) and argument[end] == '"'):
+                        raise commands.BadArgument('If the time is quoted, you must unquote it.')
+
+                    remaining = argument[end + 1:].lstrip(' ,.!')
+                else:
+                    remaining = argument[end:].lstrip(' ,.!')
+            elif len(argument) == end:
+                remaining = argument[:begin].strip()
+
+            return await result.check_constraints(ctx, now, remaining)
+        except:
+            import traceback
+            traceback.print_exc()
+            raise
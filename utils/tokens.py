@@ -1,6 +1,10 @@
+from collections import OrderedDict
 import base64
 import math
 import secrets
+import time
+
+from .queries import queries
 
 
 def bytes_to_int(x):
@@ -12,13 +16,63 @@ def int_to_bytes(n: int):
     return n.to_bytes(num_bytes, byteorder='big')
 
 
+class TokenCache:
+    """Bounded LRU cache of verified API secrets keyed on (user_id, app_id).
+
+    A value of ``None`` records that no such token exists (negative cache).
+    Entries expire after ``ttl`` seconds so that revocations made by other
+    workers are picked up eventually.
+    """
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Returns ``(found, secret)``."""
+        try:
+            expires, secret = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, secret
+
+    def put(self, key, secret):
+        self._entries[key] = (time.monotonic() + self.ttl, secret)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id, app_id=None):
+        if app_id is not None:
+            self._entries.pop((user_id, app_id), None)
+            return
+        for key in [k for k in self._entries if k[0] == user_id]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def stats(self):
+        return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
 class TokenUtils:
-    def __init__(self, app):
+    def __init__(self, app, *, cache_size=1024, cache_ttl=300):
         self.app = app
+        self.cache = TokenCache(cache_size, cache_ttl)
 
     async def existing_token(self, user_id, app_id):
-        query = 'SELECT app_name, secret FROM api_tokens WHERE user_id = $1, AND app_id = $2;'
-        row = await self.app.pool.fetchrow(query, user_id, app_id)
+        row = await queries.fetchrow(self.app.pool, 'tokens.existing', user_id, app_id)
         if not row:
             return None
         app_name, secret = row
@@ -26,8 +80,9 @@ class TokenUtils:
 
     async def new_token(self, user_id, app_name):
         secret = secrets.token_bytes()
-        query = 'INSERT INTO api_tokens (user_id, app_name, secret) VALUES ($1, $2, $3) RETURNING app_id;'
-        app_id = await self.app.pool.fetchval(query, user_id, app_name, secret)
+        app_id = await queries.fetchval(self.app.pool, 'tokens.new', user_id, app_name, secret)
+        # someone may have probed this app_id before it existed
+        self.cache.invalidate(user_id, app_id)
         return self.encode_token(user_id, app_id, secret)
 
     async def regenerate_token(self, user_id, app_id):
@@ -35,6 +90,9 @@ class TokenUtils:
         return await self.new_token(user_id, app_name)
 
     async def validate_token(self, token, user_id=None, app_id=None):
+        if isinstance(token, str):
+            # straight from the Authorization header
+            token = token.encode()
         try:
             token_user_id, token_app_id, secret = self.decode_token(token)
         except:
@@ -46,8 +104,10 @@ class TokenUtils:
         if app_id is None:
             app_id = token_app_id
 
-        query = 'SELECT secret FROM api_tokens WHERE user_id = $1 AND app_id = $2;'
-        db_secret = await self.app.pool.fetchval(query, user_id, app_id)
+        found, db_secret = self.cache.get((user_id, app_id))
+        if not found:
+            db_secret = await queries.fetchval(self.app.pool, 'tokens.secret', user_id, app_id)
+            self.cache.put((user_id, app_id), db_secret)
         if db_secret is None:
             secrets.compare_digest(token, token)
             return False
@@ -56,11 +116,13 @@ class TokenUtils:
         return (user_id, app_id) if secrets.compare_digest(token, db_token) else (None, None)
 
     async def delete_user_account(self, user_id):
-        await self.app.pool.execute('DELETE FROM api_tokens WHERE user_id = $1;', user_id)
+        await queries.execute(self.app.pool, 'tokens.delete_user', user_id)
+        self.cache.invalidate(user_id)
 
     async def delete_app(self, user_id, app_id):
-        query = 'DELETE FROM api_tokens WHERE user_id = $1 AND app_id = $2 RETURNING app_name;'
-        return await self.app.pool.fetchval(query, user_id, app_id)
+        app_name = await queries.fetchval(self.app.pool, 'tokens.delete_app', user_id, app_id)
+        self.cache.invalidate(user_id, app_id)
+        return app_name
 
     def generate_token(self, user_id, app_id):
         secret = base64.b64encode(secrets.token_bytes())